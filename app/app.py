@@ -1,7 +1,15 @@
 
+import gc
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import dash
 from dash import html, dcc
 import dash_bootstrap_components as dbc
+from flask import Response, jsonify, request, stream_with_context
+from app.data_manager import filter_rows, get_dataset, get_store, iter_csv, iter_gzip
+from app.metrics import render_metrics
+from app.model import ARTIFACT_PATH, ensure_model_training, get_model_registry, get_return_risk_table, load_saved_model
+from app.serving import ModelNotReady, optimize_requests
 
 # Initialize App with Multi-Page support and specialized Theme
 app = dash.Dash(
@@ -12,6 +20,56 @@ app = dash.Dash(
 )
 server = app.server
 
+@server.route('/metrics')
+def metrics():
+    """
+    Latency histograms, error counts, cache hit rates and the model version
+    in the Prometheus text format.
+    """
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@server.route('/api/optimize', methods=['POST'])
+def api_optimize():
+    """
+    JSON price optimization. Body: one context object or a list of them; concurrent
+    requests are micro-batched into a single forest call.
+    """
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return jsonify(error="Expected a JSON body"), 400
+    single = isinstance(payload, dict)
+    if not single and not isinstance(payload, list):
+        return jsonify(error="Expected a JSON object or a list of them"), 400
+    registry = ensure_model_training()
+    try:
+        results = optimize_requests([payload] if single else payload)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except ModelNotReady:
+        return jsonify(error="Model not ready", status=registry.status), 503
+    except FutureTimeoutError:
+        return jsonify(error="Timed out"), 504
+    return jsonify(results[0] if single else results)
+
+@server.route('/download/retail_data.csv')
+def download_csv():
+    """
+    Streams the dataset as CSV in fixed-size chunks. Query: brand/category/season
+    (repeatable) filter rows like the analytics page; gzip=1 compresses the stream.
+    """
+    # One snapshot for the whole download, even if new data is ingested meanwhile
+    df = get_dataset()
+    filters = [request.args.getlist(key) for key in ('brand', 'category', 'season')]
+    rows = filter_rows(df, *filters) if any(filters) else None
+    chunks = iter_csv(df, rows)
+    
+    filename, mimetype = 'retail_data.csv', 'text/csv'
+    if request.args.get('gzip') in ('1', 'true'):
+        chunks = iter_gzip(chunks)
+        filename, mimetype = 'retail_data.csv.gz', 'application/gzip'
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
 # Standard Navbar
 navbar = dbc.NavbarSimple(
     children=[
@@ -37,5 +95,50 @@ app.layout = html.Div([
     html.Footer("© 2025 Retail Analytics Demo", className="text-center mt-5 p-4 text-muted")
 ])
 
+def warm_up(background=True):
+    """
+    Optional start-up hook: loads the dataset, builds the shared aggregates and starts
+    the model, so the first visitors do not pay for it. Pages work without it; they
+    build whatever they need on first access.
+    """
+    def run():
+        store = get_store()
+        for name in ('filter_options', 'revenue_cube', 'inventory'):
+            store.aggregate(name)
+        ensure_model_training()
+    
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+def preload(artifact_path=ARTIFACT_PATH):
+    """
+    Builds everything the workers share before gunicorn forks them (preload_app, see
+    gunicorn.conf.py): the dataset and every registered aggregate, plus the serving
+    model, its return-risk table and the page figures when a saved artifact matches
+    the dataset. The workers then inherit them copy-on-write.
+    Never trains: without a valid artifact the workers are forked at once and the
+    model is trained on first use, so start-up does not wait for training.
+    """
+    get_store().warm()
+    if load_saved_model(artifact_path) is not None:
+        get_return_risk_table()
+        # Render every page once to fill the per-version caches their layouts read
+        # from (only with a model: layouts would otherwise start training in the master)
+        for page in dash.page_registry.values():
+            page['layout']()
+    else:
+        print("No saved model matches the dataset: workers will train it on first use")
+    
+    # Move every object built so far out of the collector's reach: a collection in a
+    # worker would otherwise write to each object's header and copy the shared pages
+    gc.collect()
+    gc.freeze()
+    return get_model_registry().status
+
 if __name__ == '__main__':
+    warm_up()
     app.run(debug=True)
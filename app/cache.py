@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Bounded, thread-safe LRU cache with an optional time-to-live.
+    max_bytes additionally bounds the summed `nbytes` of the cached values (arrays),
+    so entries that grow with the data cannot add up to unbounded memory.
+    Keeps hit/miss counters for monitoring.
+    """
+    def __init__(self, maxsize=256, ttl=None, max_bytes=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for `key` (marking it recently used), or `default`.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires, size = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self._bytes -= size
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """
+        Stores `value`, evicting the least recently used entry when full.
+        """
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        size = getattr(value, 'nbytes', 0) if self.max_bytes is not None else 0
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            if self.max_bytes is not None and size > self.max_bytes:
+                # Larger than the whole budget: serve it uncached
+                return
+            self._data[key] = (value, expires, size)
+            self._bytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                _, (_, _, evicted) = self._data.popitem(last=False)
+                self._bytes -= evicted
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value, calling `compute()` (outside the lock) on a miss.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Snapshot of the counters and occupancy.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'bytes': self._bytes
+            }
+
+    def __len__(self):
+        return len(self._data)
@@ -1,133 +1,181 @@
-
 import pandas as pd
 import numpy as np
-import random
-from datetime import datetime, timedelta
-
-def generate_retail_data(n_rows=2500):
-    np.random.seed(42)
-    random.seed(42)
-
-    # 1. Constants & Categories
-    BRANDS = ['Zara', 'H&M', 'Forever21', 'Mango', 'Uniqlo', 'Gap', 'Banana Republic', 'Ann Taylor']
-    CATEGORIES = ['Dresses', 'Tops', 'Bottoms', 'Outerwear', 'Shoes', 'Accessories']
-    SEASONS = ['Spring', 'Summer', 'Fall', 'Winter']
-    SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
-    COLORS = ['Black', 'White', 'Navy', 'Gray', 'Beige', 'Red', 'Blue', 'Green', 'Pink', 'Brown', 'Purple']
-    RETURN_REASONS = ['Size Issue', 'Quality Issue', 'Color Mismatch', 'Damaged', 'Changed Mind', 'Wrong Item']
-
-    # 2. Base Price Ranges per Category
-    BASE_PRICES = {
-        'Dresses': (40, 150),
-        'Tops': (20, 80),
-        'Bottoms': (30, 100),
-        'Outerwear': (80, 250),
-        'Shoes': (50, 180),
-        'Accessories': (15, 60)
-    }
-
-    data = []
-    
-    # Generate Products (Distinct Items) first
-    # Let's say we have 100 unique items per brand-category combo to make it realistic
-    products = []
-    for _ in range(300): # 300 unique products
-        cat = random.choice(CATEGORIES)
-        brand = random.choice(BRANDS)
-        base_low, base_high = BASE_PRICES[cat]
-        original_price = round(random.uniform(base_low, base_high), 2)
-        prod_id = f"FB{str(random.randint(1, 9999)).zfill(6)}"
-        
-        products.append({
-            'product_id': prod_id,
-            'category': cat,
-            'brand': brand,
-            'original_price': original_price
-        })
-
-    # 3. Generate Transactions
-    start_date = datetime(2024, 1, 1)
-    
-    for i in range(n_rows):
-        prod = random.choice(products)
-        
-        # Seasonality & Date
-        # Random date within 2 years
-        days_offset = random.randint(0, 700)
-        purchase_date = start_date + timedelta(days=days_offset)
-        month = purchase_date.month
-        
-        # Determine season roughly
-        if month in [12, 1, 2]: season = 'Winter'
-        elif month in [3, 4, 5]: season = 'Spring'
-        elif month in [6, 7, 8]: season = 'Summer'
-        else: season = 'Fall'
-        
-        # Attributes
-        size = random.choice(SIZES) if prod['category'] != 'Accessories' else None
-        color = random.choice(COLORS)
-        
-        # Pricing & Markdown
-        # Seasonal logic: High markdowns at end of seasons
-        markdown_pct = 0.0
-        if random.random() < 0.4: # 40% chance of being on sale
-            markdown_pct = random.choice([0.1, 0.2, 0.3, 0.5])
-            # Higher markdown if item season != current season (simulated simplisticly)
-        
-        current_price = round(prod['original_price'] * (1 - markdown_pct), 2)
-        
-        # Return Logic
-        # Rating affects return rate
-        # 15% missing ratings
-        rating = None
-        if random.random() > 0.15:
-            # Skew ratings towards 3.5 - 5
-            rating = round(np.random.triangular(1, 4.5, 5), 1)
-            
-        # Return Probability
-        # Higher if rating is low, or random chance
-        return_prob = 0.05
-        if rating and rating < 3.0: return_prob += 0.3
-        if prod['category'] in ['Dresses', 'Shoes']: return_prob += 0.1 # Size issues common
-        
-        is_returned = random.random() < return_prob
-        return_reason = None
-        if is_returned:
-            return_reason = random.choice(RETURN_REASONS)
-            if prod['category'] in ['Shoes', 'Dresses'] and random.random() < 0.6:
-                return_reason = 'Size Issue'
-                
-        # Inventory (Snapshot at time of purchase? Or current? Let's assume current stock level for that product)
-        stock_quantity = random.randint(0, 50)
-
-        row = {
-            'product_id': prod['product_id'],
-            'purchase_date': purchase_date.strftime("%Y-%m-%d"),
-            'category': prod['category'],
-            'brand': prod['brand'],
-            'season': season,
-            'size': size,
-            'color': color,
-            'stock_quantity': stock_quantity, # Current available
-            'original_price': prod['original_price'],
-            'markdown_percentage': markdown_pct,
-            'current_price': current_price,
-            'customer_rating': rating,
-            'is_returned': is_returned,
-            'return_reason': return_reason
-        }
-        data.append(row)
-
-    df = pd.DataFrame(data)
-    return df
+import os
+import json
+
+# 1. Constants & Categories
+BRANDS = ['Zara', 'H&M', 'Forever21', 'Mango', 'Uniqlo', 'Gap', 'Banana Republic', 'Ann Taylor']
+CATEGORIES = ['Dresses', 'Tops', 'Bottoms', 'Outerwear', 'Shoes', 'Accessories']
+SEASONS = ['Spring', 'Summer', 'Fall', 'Winter']
+SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+COLORS = ['Black', 'White', 'Navy', 'Gray', 'Beige', 'Red', 'Blue', 'Green', 'Pink', 'Brown', 'Purple']
+RETURN_REASONS = ['Size Issue', 'Quality Issue', 'Color Mismatch', 'Damaged', 'Changed Mind', 'Wrong Item']
+MARKDOWNS = [0.1, 0.2, 0.3, 0.5]
+
+# 2. Base Price Ranges per Category
+BASE_PRICES = {
+    'Dresses': (40, 150),
+    'Tops': (20, 80),
+    'Bottoms': (30, 100),
+    'Outerwear': (80, 250),
+    'Shoes': (50, 180),
+    'Accessories': (15, 60)
+}
+
+N_PRODUCTS = 300
+START_DATE = np.datetime64('2024-01-01')
+N_DAYS = 701 # Random date within 2 years
+
+# Season index (into SEASONS) of each calendar month (index 1-12)
+SEASON_BY_MONTH = np.array([-1, 3, 3, 0, 0, 0, 1, 1, 1, 2, 2, 2, 3])
+
+def generate_products(rng, n_products=N_PRODUCTS):
+    """
+    Distinct items as indices into CATEGORIES/BRANDS, with original price and id.
+    """
+    cat = rng.integers(0, len(CATEGORIES), n_products)
+    brand = rng.integers(0, len(BRANDS), n_products)
+    low = np.array([BASE_PRICES[c][0] for c in CATEGORIES])[cat]
+    high = np.array([BASE_PRICES[c][1] for c in CATEGORIES])[cat]
+    original_price = np.round(rng.uniform(low, high), 2)
+    ids = np.array([f"FB{i:06d}" for i in rng.integers(1, 10000, n_products)])
+    return {'category': cat, 'brand': brand, 'original_price': original_price, 'product_id': ids}
+
+def _categorical(codes, labels):
+    """
+    Categorical from indices into `labels` (-1 = missing), over the sorted vocabulary
+    so every chunk shares the same categories as a parsed CSV would.
+    """
+    labels = np.asarray(labels)
+    order = np.argsort(labels, kind='stable')
+    rank = np.empty(len(labels) + 1, dtype=np.int32)
+    rank[order] = np.arange(len(labels))
+    rank[-1] = -1
+    return pd.Categorical.from_codes(rank[codes], categories=labels[order])
+
+def generate_transactions(rng, products, n_rows):
+    """
+    One column at a time: every per-row draw is a single vectorized call.
+    """
+    prod = rng.integers(0, len(products['product_id']), n_rows)
+    category = products['category'][prod]
+    original_price = products['original_price'][prod]
+
+    # Seasonality & Date
+    purchase_date = START_DATE + rng.integers(0, N_DAYS, n_rows).astype('timedelta64[D]')
+    month = purchase_date.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    season = SEASON_BY_MONTH[month]
+
+    # Attributes (no size for accessories)
+    accessories = category == CATEGORIES.index('Accessories')
+    size = np.where(accessories, -1, rng.integers(0, len(SIZES), n_rows))
+    color = rng.integers(0, len(COLORS), n_rows)
+
+    # Pricing & Markdown: 40% chance of being on sale
+    on_sale = rng.random(n_rows) < 0.4
+    markdown_pct = np.where(on_sale, np.array(MARKDOWNS)[rng.integers(0, len(MARKDOWNS), n_rows)], 0.0)
+    current_price = np.round(original_price * (1 - markdown_pct), 2)
+
+    # Ratings skewed towards 3.5 - 5, 15% missing
+    rated = rng.random(n_rows) > 0.15
+    rating = np.where(rated, np.round(rng.triangular(1, 4.5, 5, n_rows), 1), np.nan)
+
+    # Return Probability: higher if rating is low; size issues common for Dresses/Shoes
+    fit_sensitive = np.isin(category, [CATEGORIES.index('Dresses'), CATEGORIES.index('Shoes')])
+    return_prob = 0.05 + 0.3 * (rating < 3.0) + 0.1 * fit_sensitive
+    is_returned = rng.random(n_rows) < return_prob
+
+    return_reason = rng.integers(0, len(RETURN_REASONS), n_rows)
+    return_reason[fit_sensitive & (rng.random(n_rows) < 0.6)] = RETURN_REASONS.index('Size Issue')
+    return_reason[~is_returned] = -1
+
+    # Inventory: current stock level for that product
+    stock_quantity = rng.integers(0, 51, n_rows)
+
+    # Product ids can collide, so code them against their distinct values
+    ids, id_codes = np.unique(products['product_id'], return_inverse=True)
+
+    return pd.DataFrame({
+        'product_id': _categorical(id_codes[prod], ids),
+        'purchase_date': purchase_date,
+        'category': _categorical(category, CATEGORIES),
+        'brand': _categorical(products['brand'][prod], BRANDS),
+        'season': _categorical(season, SEASONS),
+        'size': _categorical(size, SIZES),
+        'color': _categorical(color, COLORS),
+        'stock_quantity': stock_quantity, # Current available
+        'original_price': original_price,
+        'markdown_percentage': markdown_pct,
+        'current_price': current_price,
+        'customer_rating': rating,
+        'is_returned': is_returned,
+        'return_reason': _categorical(return_reason, RETURN_REASONS)
+    })
+
+def iter_retail_data(n_rows, chunk_size=1_000_000, seed=42):
+    """
+    Yields the transactions in chunks of at most chunk_size rows.
+    The output is fully determined by seed and chunk_size.
+    """
+    rng = np.random.default_rng(seed)
+    products = generate_products(rng)
+    if n_rows == 0:
+        # One empty, fully typed chunk, so writers still get the schema (and a header)
+        yield generate_transactions(rng, products, 0)
+        return
+    for start in range(0, n_rows, chunk_size):
+        yield generate_transactions(rng, products, min(chunk_size, n_rows - start))
+
+def generate_retail_data(n_rows=2500, seed=42):
+    return next(iter_retail_data(n_rows, chunk_size=max(n_rows, 1), seed=seed))
+
+def write_retail_data(path, n_rows, fmt='csv', chunk_size=1_000_000, seed=42, build_cache=True):
+    """
+    Streams n_rows transactions to disk without holding them all in memory.
+    fmt='csv': appends chunks to the CSV at `path` and, with build_cache, writes the
+               matching columnar cache alongside so load_data() starts warm.
+    fmt='columnar': writes the derived columnar layout to the directory `path`
+                    (load it with data_manager.read_columnar).
+    """
+    from app.data_manager import ColumnarWriter, derive_columns, open_cache_writer, publish_cache
+
+    if fmt == 'columnar':
+        os.makedirs(path, exist_ok=True)
+        writer = ColumnarWriter(path, n_rows)
+        for chunk in iter_retail_data(n_rows, chunk_size, seed):
+            writer.write(derive_columns(chunk))
+        meta = writer.close()
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        return path
+    if fmt != 'csv':
+        raise ValueError(f"Unknown format: {fmt}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    writer = open_cache_writer(path, n_rows) if build_cache else None
+    with open(path, 'w', newline='') as f:
+        for i, chunk in enumerate(iter_retail_data(n_rows, chunk_size, seed)):
+            chunk.to_csv(f, header=(i == 0), index=False)
+            if writer is not None:
+                writer.write(derive_columns(chunk))
+    if writer is not None:
+        publish_cache(writer, path)
+    return path
 
 if __name__ == "__main__":
-    import os
-    os.makedirs('data', exist_ok=True)
+    import argparse
+    import sys
+    # Allow `python app/data_generation.py`: import the `app` package from the repo
+    # root rather than app/app.py from the script's own directory
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Generate synthetic retail data")
+    parser.add_argument('--rows', type=int, default=3000)
+    parser.add_argument('--output', default='data/retail_trend_data.csv')
+    parser.add_argument('--format', choices=['csv', 'columnar'], default='csv')
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
     print("Generating synthetic retail data...")
-    df = generate_retail_data(3000)
-    save_path = 'data/retail_trend_data.csv'
-    df.to_csv(save_path, index=False)
-    print(f"Data generated at {save_path}")
-    print(df.head())
-    print(df.info())
+    write_retail_data(args.output, args.rows, fmt=args.format, chunk_size=args.chunk_size, seed=args.seed)
+    print(f"Data generated at {args.output}")
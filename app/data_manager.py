@@ -1,20 +1,81 @@
 import pandas as pd
 import numpy as np
 import os
+import json
+import shutil
+import threading
+import zlib
+from app.metrics import Gauge, register, timed
 
 DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'retail_trend_data.csv')
 
-def load_data():
+# Copy-on-Write makes the shallow views handed out by the DatasetStore safe to
+# modify locally without touching the shared frame (always on from pandas 3).
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+# Columnar cache of the fully derived frame, one directory per CSV version
+CACHE_FORMAT = 4
+
+# Columns of a raw transaction (CSV / generator / ingest batch)
+RAW_COLUMNS = ['product_id', 'purchase_date', 'category', 'brand', 'season', 'size', 'color', 'stock_quantity',
+               'original_price', 'markdown_percentage', 'current_price', 'customer_rating', 'is_returned', 'return_reason']
+
+# Estimated cost as a share of the original price
+COST_RATIO = 0.4 # 60% markup
+
+# Compact in-memory schema: categorical codes for labels, 32/16-bit numerics
+CATEGORICAL_COLUMNS = ['product_id', 'category', 'brand', 'season', 'size', 'color', 'return_reason']
+FLOAT32_COLUMNS = ['original_price', 'markdown_percentage', 'current_price', 'customer_rating',
+                   'Revenue', 'cost_price', 'Profit', 'Margin']
+INT16_COLUMNS = ['stock_quantity']
+
+# Rows serialized per chunk by the streaming CSV export
+EXPORT_CHUNK_ROWS = 50_000
+
+@timed('load_data')
+def load_data(path=None, use_cache=True):
     """
-    Loads the retail trend data from CSV.
+    Loads the retail trend data.
+    Reads the columnar cache when it matches the CSV, otherwise parses the CSV
+    and rebuilds the cache.
     """
-    if not os.path.exists(DATA_PATH):
-        raise FileNotFoundError(f"Data file not found at {DATA_PATH}. Please run data_generation.py first.")
+    path = path or DATA_PATH
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Data file not found at {path}. Please run data_generation.py first.")
+    
+    if use_cache:
+        df = read_cache(path)
+        if df is not None:
+            return df
     
-    df = pd.read_csv(DATA_PATH)
+    df = parse_csv(path)
+    
+    if use_cache:
+        write_cache(df, path)
+        # Serve the read-only mapping just written rather than the parsed copy: its
+        # pages are clean and shared by every process (and forked worker) using it
+        cached = read_cache(path)
+        if cached is not None:
+            return cached
+    return df
+
+def parse_csv(path):
+    """
+    Parses the raw CSV and derives the analytics columns.
+    """
+    return derive_columns(pd.read_csv(path))
+
+def derive_columns(df, cost_map=None):
+    """
+    Adds the analytics columns to raw transactions and compacts the schema.
+    cost_map: product cost map to extend with this batch (built from the batch if None).
+    """
+    df = compact_frame(df)
     
     # Ensure types
-    df['purchase_date'] = pd.to_datetime(df['purchase_date'])
+    # Same resolution whatever the source (CSV parse, generator chunks)
+    df['purchase_date'] = pd.to_datetime(df['purchase_date']).astype('datetime64[ns]')
     
     # Derived Features for Analytics
     # Revenue = current_price (since each row is a transaction)
@@ -23,17 +84,443 @@ def load_data():
     # Margin Estimate (using original price as proxy for cost basis is tricky without cost data)
     # Let's assume Cost is roughly 40-60% of original price (randomized slightly in generation or here)
     # For consistency, let's deterministicly estimate cost so it doesn't change on reload
-    np.random.seed(42)
     # create a cost map per product to be consistent
-    unique_prods = df[['product_id', 'original_price']].drop_duplicates()
-    unique_prods['cost_price'] = unique_prods['original_price'] * 0.4 # 60% markup
+    cost_map = update_cost_map(cost_map, df)
     
-    df = df.merge(unique_prods[['product_id', 'cost_price']], on='product_id', how='left')
+    # Join on both keys: a product_id can carry several original prices
+    df = df.merge(cost_map, on=['product_id', 'original_price'], how='left')
     
     df['Profit'] = df['Revenue'] - df['cost_price']
     df['Margin'] = (df['Profit'] / df['Revenue']) * 100
     
-    return df
+    # Re-compact: joining categoricals with different vocabularies yields objects
+    return compact_frame(df)
+
+def update_cost_map(cost_map, df):
+    """
+    Adds the (product_id, original_price) pairs of `df` missing from `cost_map`.
+    """
+    pairs = df[['product_id', 'original_price']].drop_duplicates()
+    if cost_map is not None:
+        known = pairs.merge(cost_map[['product_id', 'original_price']], how='left', indicator=True)
+        pairs = pairs[(known['_merge'] == 'left_only').to_numpy()]
+    pairs = pairs.assign(cost_price=pairs['original_price'] * np.float32(COST_RATIO))
+    if cost_map is None:
+        return pairs.reset_index(drop=True)
+    return concat_frames(cost_map, pairs)
+
+def concat_frames(*frames):
+    """
+    Concatenates frames, merging the vocabularies of shared categorical columns
+    (plain pd.concat would fall back to object columns).
+    """
+    frames = list(frames)
+    for col in frames[0].columns:
+        if not all(isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames):
+            continue
+        categories = sorted(set().union(*(f[col].cat.categories for f in frames)))
+        frames = [
+            f if f[col].cat.categories.tolist() == categories
+            else f.assign(**{col: f[col].cat.set_categories(categories)})
+            for f in frames
+        ]
+    return pd.concat(frames, ignore_index=True)
+
+def compact_frame(df):
+    """
+    Converts a derived frame to the compact schema (categoricals, float32, int16
+    where the values fit, int32 otherwise).
+    """
+    dtypes = {col: 'category' for col in CATEGORICAL_COLUMNS}
+    dtypes.update({col: np.float32 for col in FLOAT32_COLUMNS})
+    for col in INT16_COLUMNS:
+        if col in df.columns:
+            dtypes[col] = _small_int_dtype(df[col])
+    return df.astype({col: dtype for col, dtype in dtypes.items() if col in df.columns})
+
+def _small_int_dtype(values):
+    # int16 only where every value fits: astype would wrap larger counts silently
+    info = np.iinfo(np.int16)
+    if len(values) and (values.min() < info.min or values.max() > info.max):
+        return np.int32
+    return np.int16
+
+def memory_report(df):
+    """
+    Bytes used per column (deep), with the share of a row each column takes.
+    """
+    usage = df.memory_usage(deep=True, index=False)
+    n_rows = max(len(df), 1)
+    return pd.DataFrame({
+        'Column': usage.index,
+        'Dtype': [str(df[col].dtype) for col in usage.index],
+        'Bytes': usage.to_numpy(),
+        'Bytes/Row': (usage.to_numpy() / n_rows).round(2)
+    })
+
+def _cache_key(path):
+    # The format is part of the key so a cache left by an older layout is replaced
+    # (and cleaned up) rather than blocking the new one from being published
+    st = os.stat(path)
+    return f"v{CACHE_FORMAT}-{st.st_mtime_ns}-{st.st_size}"
+
+def _cache_root(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(os.path.dirname(os.path.abspath(path)), '.cache', name)
+
+def read_cache(path):
+    """
+    Returns the cached frame for the CSV at `path`, or None if missing/stale.
+    Numeric columns are memory-mapped rather than read into memory.
+    """
+    cache_dir = os.path.join(_cache_root(path), _cache_key(path))
+    try:
+        with open(os.path.join(cache_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('format') != CACHE_FORMAT:
+            return None
+        return read_columnar(cache_dir, meta)
+    except (OSError, ValueError, KeyError):
+        return None
+
+def read_columnar(cache_dir, meta=None):
+    """
+    Builds a DataFrame from a directory of per-column .npy files.
+    """
+    if meta is None:
+        with open(os.path.join(cache_dir, 'meta.json')) as f:
+            meta = json.load(f)
+    columns = {}
+    for spec in meta['columns']:
+        # Plain ndarray view over the read-only mapping
+        arr = np.asarray(np.load(os.path.join(cache_dir, spec['file']), mmap_mode='r'))
+        if spec['kind'] == 'category':
+            columns[spec['name']] = pd.Categorical.from_codes(arr, categories=spec['categories'])
+        else:
+            columns[spec['name']] = arr
+    return pd.DataFrame(columns, copy=False)
+
+class ColumnarWriter:
+    """
+    Writes a frame of known length to per-column .npy files, chunk by chunk.
+    Every chunk must have the same columns, dtypes and categories.
+    """
+    def __init__(self, cache_dir, n_rows):
+        self.cache_dir = cache_dir
+        self.n_rows = n_rows
+        self.offset = 0
+        self._specs = None
+        self._arrays = []
+
+    def write(self, chunk):
+        if self._specs is None:
+            self._open(chunk)
+        end = self.offset + len(chunk)
+        if end > self.n_rows:
+            raise ValueError(f"Writing {end} rows into a layout of {self.n_rows}")
+        for spec, arr in zip(self._specs, self._arrays):
+            series = chunk[spec['name']]
+            if spec['kind'] == 'category':
+                if series.cat.categories.tolist() != spec['categories']:
+                    raise ValueError(f"Categories of '{spec['name']}' changed between chunks")
+                arr[self.offset:end] = series.cat.codes.to_numpy()
+            else:
+                values = series.to_numpy()
+                if arr.dtype.kind == 'i' and values.dtype != arr.dtype and not np.array_equal(values.astype(arr.dtype), values):
+                    raise ValueError(f"Values of '{spec['name']}' do not fit the column's {arr.dtype}")
+                arr[self.offset:end] = values
+        self.offset = end
+
+    def close(self):
+        """
+        Flushes the column files and returns the layout metadata.
+        """
+        if self.offset != self.n_rows:
+            raise ValueError(f"Wrote {self.offset} of {self.n_rows} rows")
+        if self._specs is None:
+            # Even zero rows need one (empty) chunk to fix the columns and dtypes
+            raise ValueError("No chunk written: the column layout is unknown")
+        for arr in self._arrays:
+            arr.flush()
+        self._arrays = []
+        return {'format': CACHE_FORMAT, 'n_rows': self.n_rows, 'columns': self._specs or []}
+
+    def _open(self, chunk):
+        self._specs = []
+        for i, col in enumerate(chunk.columns):
+            spec = {'name': col, 'file': f"{i:03d}.npy"}
+            series = chunk[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                spec['kind'] = 'category'
+                spec['categories'] = series.cat.categories.tolist()
+                dtype = series.cat.codes.dtype
+            else:
+                spec['kind'] = 'array'
+                dtype = series.to_numpy().dtype
+            self._arrays.append(np.lib.format.open_memmap(
+                os.path.join(self.cache_dir, spec['file']), mode='w+', dtype=dtype, shape=(self.n_rows,)))
+            self._specs.append(spec)
+
+def write_columnar(df, cache_dir):
+    """
+    Writes each column of `df` to `cache_dir` (with meta.json) and returns the layout metadata.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    writer = ColumnarWriter(cache_dir, len(df))
+    writer.write(df)
+    meta = writer.close()
+    with open(os.path.join(cache_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    return meta
+
+def open_cache_writer(path, n_rows):
+    """
+    Starts building the columnar cache for the CSV at `path` in a private directory.
+    Finish with publish_cache() once the CSV itself is complete.
+    """
+    tmp_dir = os.path.join(_cache_root(path), f".tmp-{os.getpid()}-{threading.get_ident()}")
+    os.makedirs(tmp_dir, exist_ok=True)
+    return ColumnarWriter(tmp_dir, n_rows)
+
+def publish_cache(writer, path):
+    """
+    Completes `writer` and makes it the cache of the CSV's current version.
+    """
+    root = _cache_root(path)
+    key = _cache_key(path)
+    meta = writer.close()
+    meta['source'] = key
+    with open(os.path.join(writer.cache_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    try:
+        os.rename(writer.cache_dir, os.path.join(root, key))
+    except OSError:
+        # Another worker published the same version first
+        shutil.rmtree(writer.cache_dir, ignore_errors=True)
+    # Drop caches built from older versions of the CSV
+    for entry in os.listdir(root):
+        if entry != key and not entry.startswith('.tmp-'):
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+
+def write_cache(df, path):
+    """
+    Persists the derived frame as one .npy file per column, keyed by the
+    CSV's mtime and size. Failures (e.g. read-only filesystem) are ignored.
+    """
+    writer = None
+    try:
+        writer = open_cache_writer(path, len(df))
+        writer.write(df)
+        publish_cache(writer, path)
+    except OSError:
+        if writer is not None:
+            shutil.rmtree(writer.cache_dir, ignore_errors=True)
+
+class DatasetStore:
+    """
+    Process-wide holder for the retail dataset.
+    Loads the CSV once and hands out read-only views of the shared frame,
+    plus derived aggregates computed once per dataset version.
+    """
+    def __init__(self, loader=load_data):
+        self._loader = loader
+        self._df = None
+        self._version = 0
+        self._builders = {}
+        self._updaters = {}
+        self._aggregates = {}
+        self._lock = threading.RLock()
+
+    @property
+    def version(self):
+        """
+        Generation number, bumped every time the underlying frame is replaced.
+        """
+        return self._version
+
+    def get(self):
+        """
+        Returns a view of the shared frame, loading it on first access.
+        """
+        # Shallow copy: shares the column buffers, Copy-on-Write keeps the
+        # shared frame intact if a caller modifies its view.
+        return self._frame().copy(deep=False)
+
+    def snapshot(self, name=None):
+        """
+        (version, frame view) or, with `name`, (version, aggregate), read together so
+        caches keyed by version never pair one version with another's data.
+        """
+        with self._lock:
+            value = self.get() if name is None else self.aggregate(name)
+            return self._version, value
+
+    def register_aggregate(self, name, build, update=None):
+        """
+        Registers `build(df)`, computed lazily once per dataset version.
+        `update(value, new_rows)` folds appended rows into an already built value;
+        without it the aggregate is rebuilt from scratch after an append.
+        """
+        with self._lock:
+            self._builders[name] = build
+            self._updaters[name] = update
+            self._aggregates.pop(name, None)
+
+    def aggregate(self, name):
+        """
+        Returns the named aggregate for the current dataset version.
+        """
+        value = self._aggregates.get(name)
+        if value is None:
+            with self._lock:
+                value = self._aggregates.get(name)
+                if value is None:
+                    value = self._builders[name](self._frame())
+                    self._aggregates[name] = value
+        return value
+
+    def warm(self):
+        """
+        Loads the frame and builds every registered aggregate; returns the version.
+        """
+        with self._lock:
+            for name in list(self._builders):
+                self.aggregate(name)
+            return self._version
+
+    def _frame(self):
+        df = self._df
+        if df is None:
+            with self._lock:
+                if self._df is None:
+                    self._set(self._loader())
+                df = self._df
+        return df
+
+    def append(self, rows):
+        """
+        Ingests new raw transactions (DataFrame or list of dicts with RAW_COLUMNS)
+        without re-reading the source: derives the batch against the current cost map,
+        updates the built aggregates by delta and bumps the version.
+        """
+        new = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+        missing = [col for col in RAW_COLUMNS if col not in new.columns]
+        if missing:
+            raise ValueError(f"Missing transaction columns: {missing}")
+        
+        with self._lock:
+            df = self._frame()
+            new = derive_columns(new[RAW_COLUMNS], self.aggregate('cost_map'))
+            
+            aggregates = {}
+            for name, value in self._aggregates.items():
+                update = self._updaters.get(name)
+                if update is not None:
+                    aggregates[name] = update(value, new)
+            
+            self._aggregates = aggregates
+            self._df = concat_frames(df, new)
+            self._version += 1
+            return self._version
+
+    def reload(self):
+        """
+        Re-reads the data source and bumps the version.
+        """
+        with self._lock:
+            self._set(self._loader())
+        return self._version
+
+    def _set(self, df):
+        self._df = df
+        self._aggregates = {}
+        self._version += 1
+
+# Grain of the analytics cube
+CUBE_DIMENSIONS = ['Month', 'brand', 'category', 'season']
+
+def build_revenue_cube(df):
+    """
+    Revenue sum and transaction count per month x brand x category x season.
+    """
+    month = df['purchase_date'].dt.to_period('M').astype(str).rename('Month')
+    # Sum in float64: the float32 column would lose cents on large totals
+    revenue = df['Revenue'].astype(np.float64)
+    cube = revenue.groupby([month, df['brand'], df['category'], df['season']], observed=True).agg(['sum', 'size'])
+    cube.columns = ['Revenue', 'Count']
+    return cube.reset_index()
+
+def update_revenue_cube(cube, new_rows):
+    """
+    Adds the cube of a batch of new rows to an existing cube.
+    """
+    combined = concat_frames(cube, build_revenue_cube(new_rows))
+    return combined.groupby(CUBE_DIMENSIONS, observed=True, as_index=False)[['Revenue', 'Count']].sum()
+
+INVENTORY_COLUMNS = ['product_id', 'brand', 'category', 'stock_quantity', 'current_price']
+
+def build_inventory_snapshot(df):
+    """
+    Latest stock entry per product (the data is transactional, so the most
+    recent transaction carries the current stock_quantity).
+    """
+    latest = df.sort_values('purchase_date', kind='stable').drop_duplicates('product_id', keep='last')
+    return latest[['purchase_date'] + INVENTORY_COLUMNS].sort_values('product_id').reset_index(drop=True)
+
+def update_inventory_snapshot(snapshot, new_rows):
+    """
+    Refreshes the products touched by a batch of new rows.
+    """
+    return build_inventory_snapshot(concat_frames(snapshot, new_rows[snapshot.columns]))
+
+def build_kpi_totals(df):
+    """
+    Running sums behind the Home KPIs (float64, so they do not drift as batches are added).
+    """
+    margin = df['Margin'].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(margin)
+    return {
+        'rows': len(df),
+        'revenue': float(df['Revenue'].to_numpy(dtype=np.float64).sum()),
+        'margin_sum': float(margin[valid].sum()),
+        'margin_count': int(valid.sum()),
+        'returned': int(df['is_returned'].sum())
+    }
+
+def update_kpi_totals(totals, new_rows):
+    """
+    Adds the sums of a batch of new rows to the running totals.
+    """
+    batch = build_kpi_totals(new_rows)
+    return {key: totals[key] + batch[key] for key in totals}
+
+def kpi_values(totals):
+    """
+    (total revenue, average margin %, return rate %) from the running totals.
+    """
+    avg_margin = totals['margin_sum'] / totals['margin_count'] if totals['margin_count'] else 0.0
+    return_rate = totals['returned'] / totals['rows'] * 100 if totals['rows'] else 0.0
+    return totals['revenue'], avg_margin, return_rate
+
+def build_return_summary(df):
+    """
+    Returned transactions per return reason, and returned/total transactions per category.
+    """
+    returned = df['is_returned'].to_numpy(dtype=bool)
+    by_reason = df['return_reason'][returned].value_counts(sort=False)
+    by_category = df.groupby('category', observed=True)['is_returned'].agg(['sum', 'size'])
+    by_category.columns = ['returned', 'count']
+    # Plain label indexes: batches with other vocabularies still align on add
+    by_reason.index = by_reason.index.astype(object)
+    by_category.index = by_category.index.astype(object)
+    return {'by_reason': by_reason.astype(np.int64), 'by_category': by_category.astype(np.int64)}
+
+def update_return_summary(summary, new_rows):
+    """
+    Adds the counts of a batch of new rows to an existing summary.
+    """
+    batch = build_return_summary(new_rows)
+    return {key: summary[key].add(batch[key], fill_value=0).astype(np.int64) for key in summary}
 
 def get_filter_options(df):
     """
@@ -45,3 +532,125 @@ def get_filter_options(df):
         'seasons': sorted(df['season'].unique()),
         'sizes': sorted(df['size'].dropna().unique())
     }
+
+def new_retail_store(loader=load_data):
+    """
+    DatasetStore with the aggregates the pages rely on.
+    """
+    store = DatasetStore(loader)
+    store.register_aggregate('cost_map', lambda df: update_cost_map(None, df), update_cost_map)
+    store.register_aggregate('revenue_cube', build_revenue_cube, update_revenue_cube)
+    store.register_aggregate('inventory', build_inventory_snapshot, update_inventory_snapshot)
+    store.register_aggregate('filter_options', get_filter_options)
+    store.register_aggregate('kpi_totals', build_kpi_totals, update_kpi_totals)
+    store.register_aggregate('return_summary', build_return_summary, update_return_summary)
+    return store
+
+_store = new_retail_store()
+
+register(Gauge('retail_dataset_version', "Generation number of the shared dataset.",
+               lambda: [((), _store.version)]))
+register(Gauge('retail_dataset_rows', "Rows in the shared dataset (0 until first loaded).",
+               lambda: [((), 0 if _store._df is None else len(_store._df))]))
+
+def get_store():
+    """
+    Returns the process-wide DatasetStore.
+    """
+    return _store
+
+def get_dataset():
+    """
+    Returns a read-only view of the shared dataset (loaded once per process).
+    """
+    return _store.get()
+
+def get_dataset_version():
+    """
+    Returns the generation number of the shared dataset.
+    """
+    return _store.version
+
+def get_snapshot(name=None):
+    """
+    Returns (version, frame) of the shared dataset, or (version, aggregate) for `name`.
+    """
+    return _store.snapshot(name)
+
+def get_revenue_cube():
+    """
+    Returns the pre-aggregated revenue cube of the shared dataset (see CUBE_DIMENSIONS).
+    """
+    return _store.aggregate('revenue_cube')
+
+def get_inventory_snapshot():
+    """
+    Returns the latest stock entry per product of the shared dataset.
+    """
+    return _store.aggregate('inventory')
+
+def get_kpi_totals():
+    """
+    Returns the running KPI totals of the shared dataset (see kpi_values).
+    """
+    return _store.aggregate('kpi_totals')
+
+def get_return_summary():
+    """
+    Returns the return counts per reason and per category of the shared dataset.
+    """
+    return _store.aggregate('return_summary')
+
+def append_transactions(rows):
+    """
+    Ingests new transactions into the shared dataset; returns the new version.
+    """
+    return _store.append(rows)
+
+def to_display_records(df):
+    """
+    Records for DataTables, with float32 noise (e.g. 37.810001) rounded away.
+    """
+    return display_frame(df).to_dict('records')
+
+def display_frame(df):
+    """
+    df with float32 columns widened and rounded to 4 places for presentation.
+    """
+    floats = [col for col in df.columns if df[col].dtype == np.float32]
+    return df.astype({col: np.float64 for col in floats}).round({col: 4 for col in floats})
+
+def filter_rows(df, brands=None, categories=None, seasons=None):
+    """
+    Positions of the rows matching the analytics filters (empty = no filter).
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for col, values in (('brand', brands), ('category', categories), ('season', seasons)):
+        if values:
+            mask &= df[col].isin(values).to_numpy()
+    return np.flatnonzero(mask)
+
+def iter_csv(df, rows=None, chunk_size=EXPORT_CHUNK_ROWS):
+    """
+    Yields df (or only its `rows` positions) as CSV text, chunk_size rows at a time,
+    so only one chunk is ever serialized in memory.
+    """
+    yield df.head(0).to_csv(index=False)
+    n_rows = len(df) if rows is None else len(rows)
+    for start in range(0, n_rows, chunk_size):
+        if rows is None:
+            chunk = df.iloc[start:start + chunk_size]
+        else:
+            chunk = df.take(rows[start:start + chunk_size])
+        yield display_frame(chunk).to_csv(header=False, index=False)
+
+def iter_gzip(chunks, level=6):
+    """
+    Gzip-compresses a stream of text chunks incrementally (one gzip member).
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,225 @@
+import bisect
+import functools
+import os
+import threading
+import time
+
+# RETAIL_METRICS=0 turns instrumentation off: functions decorated while it is off are
+# left unwrapped, and set_enabled(False) reduces the wrappers to a single flag check
+ENABLED_AT_IMPORT = os.environ.get('RETAIL_METRICS', '1').lower() not in ('0', 'false', 'off', 'no')
+_enabled = ENABLED_AT_IMPORT
+
+# Latency buckets in seconds, from sub-millisecond predictions to full training runs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def set_enabled(enabled):
+    """
+    Switches recording on or off at runtime.
+    """
+    global _enabled
+    _enabled = bool(enabled)
+
+def is_enabled():
+    return _enabled
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values))
+    return '{' + pairs + '}'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """
+    Monotonic count per label set.
+    """
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+class Histogram:
+    """
+    Cumulative bucket counts, sum and count per label set (Prometheus histogram).
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, ([*s[0]], s[1], s[2])) for labels, s in self._series.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                yield (f'{self.name}_bucket',
+                       _format_labels(self.labelnames + ('le',), labels + (_format_value(bound),)), cumulative)
+            yield f'{self.name}_sum', _format_labels(self.labelnames, labels), total
+            yield f'{self.name}_count', _format_labels(self.labelnames, labels), count
+
+class Gauge:
+    """
+    Values read at scrape time: collect() returns [(label values, value), ...].
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, help, collect, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def samples(self):
+        for labels, value in self.collect():
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+_registry = []
+_registry_lock = threading.Lock()
+
+def register(metric):
+    """
+    Adds a metric to the /metrics output; returns it.
+    """
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+OPERATION_LATENCY = register(Histogram(
+    'retail_operation_seconds', "Latency of data and model hot paths.", labelnames=('operation',)
+))
+CALLBACK_LATENCY = register(Histogram(
+    'retail_callback_seconds', "Latency of Dash callbacks, figure building included.", labelnames=('callback',)
+))
+ERRORS = register(Counter(
+    'retail_errors_total', "Instrumented calls that raised.", labelnames=('name',)
+))
+
+class timed:
+    """
+    Records the wall time of a block or function into a latency histogram.
+        @timed('train')                                  # OPERATION_LATENCY
+        @timed('update_analytics', histogram=CALLBACK_LATENCY)
+        with timed('encode'): ...
+    """
+    def __init__(self, name, histogram=OPERATION_LATENCY):
+        self.name = name
+        self.histogram = histogram
+        self._started = None
+
+    def __call__(self, func):
+        if not ENABLED_AT_IMPORT:
+            return func
+        name, histogram = self.name, self.histogram
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                ERRORS.inc(name)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started, name)
+        return wrapper
+
+    def __enter__(self):
+        self._started = time.perf_counter() if _enabled else None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._started is not None:
+            if exc_type is not None:
+                ERRORS.inc(self.name)
+            self.histogram.observe(time.perf_counter() - self._started, self.name)
+        return False
+
+def timed_callback(func):
+    """
+    timed() for a Dash callback, labelled with the function name.
+    Apply below @callback so Dash registers the timed function.
+    """
+    return timed(func.__name__, histogram=CALLBACK_LATENCY)(func)
+
+# Caches reported as retail_cache_* gauges, by name
+_caches = {}
+
+def register_cache(name, cache):
+    """
+    Exposes an LRUCache's hits, misses, hit rate and size.
+    """
+    _caches[name] = cache
+    return cache
+
+def _cache_samples(field):
+    def collect():
+        return [((name,), cache.stats()[field]) for name, cache in sorted(_caches.items())]
+    return collect
+
+register(Gauge('retail_cache_hits', "Cache hits since start.", _cache_samples('hits'), ('cache',)))
+register(Gauge('retail_cache_misses', "Cache misses since start.", _cache_samples('misses'), ('cache',)))
+register(Gauge('retail_cache_hit_ratio', "Cache hit rate since start.", _cache_samples('hit_rate'), ('cache',)))
+register(Gauge('retail_cache_entries', "Entries currently cached.", _cache_samples('size'), ('cache',)))
+register(Gauge('retail_cache_bytes', "Array bytes held by byte-bounded caches.", _cache_samples('bytes'), ('cache',)))
+
+def render_metrics():
+    """
+    Every registered metric in the Prometheus text exposition format.
+    """
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, labels, value in metric.samples():
+            lines.append(f'{name}{labels} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
@@ -1,69 +1,431 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from app.cache import LRUCache
+from app.data_manager import get_dataset, get_snapshot
+from app.metrics import Gauge, register, register_cache, timed
 
-class RetailModelManager:
-    def __init__(self):
-        self.demand_model = RandomForestRegressor(n_estimators=50, random_state=42)
-        self.return_model = RandomForestClassifier(n_estimators=50, random_state=42)
-        self.encoders = {}
-        self.is_trained = False
+ARTIFACT_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'retail_models.joblib')
+# Bump whenever the artifact layout or the feature pipeline changes
+ARTIFACT_VERSION = 5
+
+CATEGORICAL_FEATURES = ['brand', 'category', 'season', 'size', 'color']
+NUMERICAL_FEATURES = ['current_price', 'markdown_percentage', 'original_price']
+FEATURES = CATEGORICAL_FEATURES + NUMERICAL_FEATURES
+
+# Results of the optimizer page, shared by all threads of a worker; keys carry the
+# model version so a retrained model never serves stale entries
+OPTIMIZATION_CACHE = register_cache('optimization', LRUCache(maxsize=512, ttl=3600))
+# Largest batch scored by the FlatForest backend; sklearn's compiled tree walks win beyond it
+FLAT_MAX_ROWS = 256
+# Per-product return risk tables, keyed by (model_version, dataset version)
+RISK_TABLE_CACHE = register_cache('risk_table', LRUCache(maxsize=4))
+# Backoff between retries of a failed first model build, in seconds (doubling)
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 300
+
+logger = logging.getLogger(__name__)
+
+# Code given to labels outside the fitted vocabulary
+UNKNOWN_CODE = -1
+# Label standing in for missing values (e.g. no size for accessories)
+MISSING_LABEL = 'NA'
+
+# Columns the models are trained on, used to fingerprint the training data
+TRAINING_COLUMNS = ['purchase_date', 'product_id', 'brand', 'category', 'season', 'size', 'color',
+                    'current_price', 'markdown_percentage', 'original_price', 'is_returned']
+
+# Keys of the daily demand aggregate
+DAILY_KEYS = ['purchase_date', 'product_id', 'brand', 'category', 'season', 'current_price',
+              'markdown_percentage', 'original_price', 'size', 'color']
+
+def data_fingerprint(df):
+    """
+    Hash of the training columns of `df`: row count plus the wrapping sum of the row hashes.
+    Composable, so an incrementally trained model can extend it with each batch.
+    """
+    hashes = pd.util.hash_pandas_object(df[TRAINING_COLUMNS], index=False).to_numpy()
+    return f"{len(hashes)}-{int(hashes.sum(dtype=np.uint64)):016x}"
+
+def combine_fingerprints(a, b):
+    """
+    Fingerprint of the concatenation of two frames from their fingerprints.
+    """
+    (n_a, sum_a), (n_b, sum_b) = (fp.split('-') for fp in (a, b))
+    return f"{int(n_a) + int(n_b)}-{(int(sum_a, 16) + int(sum_b, 16)) % 2**64:016x}"
+
+def aggregate_daily_sales(df):
+    """
+    Units sold per product context and day.
+    """
+    return df.groupby(DAILY_KEYS, observed=True).size().reset_index(name='units_sold')
+
+class CategoricalEncoder:
+    """
+    Frozen label -> integer code mapping per categorical column.
+    Fitted once, then shared by every model and every transform.
+    """
+    def __init__(self, columns=CATEGORICAL_FEATURES):
+        self.columns = list(columns)
+        self.vocabulary = {}
+        self._lookup = {}
+
+    def fit(self, df):
+        """
+        Learns the sorted vocabulary of each column; missing values get MISSING_LABEL.
+        """
+        for col in self.columns:
+            values = df[col]
+            labels = set(values.dropna().unique())
+            if values.isna().any():
+                labels.add(MISSING_LABEL)
+            self.vocabulary[col] = pd.Index(sorted(labels))
+            self._lookup[col] = {label: code for code, label in enumerate(self.vocabulary[col])}
+        return self
+
+    def transform_column(self, col, values):
+        """
+        Vectorized lookup of the codes for a Series; unseen labels map to UNKNOWN_CODE.
+        """
+        vocab = self.vocabulary[col]
+        missing_code = self._lookup[col].get(MISSING_LABEL, UNKNOWN_CODE)
         
-    def prepare_features(self, df):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Map the (few) categories once, then index by the row codes;
+            # row code -1 (missing) picks the appended missing_code
+            lookup = np.append(vocab.get_indexer(values.cat.categories), missing_code)
+            return lookup[values.cat.codes.to_numpy()]
+        
+        codes = vocab.get_indexer(values)
+        codes[values.isna().to_numpy()] = missing_code
+        return codes
+
+    def transform_value(self, col, value):
+        """
+        Code for a single label.
         """
-        Encodes categorical features for ML.
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            value = MISSING_LABEL
+        return self._lookup[col].get(value, UNKNOWN_CODE)
+
+def catalogue_contexts(df):
+    """
+    Every product (id, brand, category, original price) crossed with the sizes seen
+    for its category, every color and every season.
+    """
+    products = df[['product_id', 'brand', 'category', 'original_price']].drop_duplicates()
+    sizes = df[['category', 'size']].drop_duplicates()
+    colors = pd.DataFrame({'color': df['color'].dropna().unique()})
+    seasons = pd.DataFrame({'season': df['season'].dropna().unique()})
+    
+    contexts = products.merge(sizes, on='category').merge(colors, how='cross').merge(seasons, how='cross')
+    return contexts.reset_index(drop=True)
+
+class FlatForest:
+    """
+    A fitted sklearn forest compiled into flat node arrays (all trees concatenated),
+    evaluated by walking every row down every tree at once with NumPy.
+    Leaves point to themselves, so a fixed number of steps (the depth) reaches them all.
+    Skips sklearn's validation and per-tree dispatch, which dominate small batches.
+    """
+    def __init__(self, feature, threshold, left, right, value, roots, depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+
+    @classmethod
+    def from_sklearn(cls, forest):
         """
-        data = df.copy()
+        Compiles a fitted RandomForestRegressor (value = prediction) or
+        RandomForestClassifier (value = class probabilities).
+        """
+        trees = [est.tree_ for est in forest.estimators_]
+        sizes = np.array([t.node_count for t in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
         
-        # Features to use
-        categorical_cols = ['brand', 'category', 'season', 'size', 'color']
-        numerical_cols = ['current_price', 'markdown_percentage', 'original_price']
+        feature, threshold, left, right, value = [], [], [], [], []
+        for t, offset in zip(trees, offsets):
+            leaf = t.children_left < 0
+            own = np.arange(t.node_count) + offset
+            feature.append(np.where(leaf, 0, t.feature))
+            threshold.append(t.threshold)
+            left.append(np.where(leaf, own, t.children_left + offset))
+            right.append(np.where(leaf, own, t.children_right + offset))
+            v = t.value[:, 0, :]
+            if hasattr(forest, 'classes_'):
+                # Per-tree class probabilities, as in DecisionTreeClassifier.predict_proba
+                v = v / v.sum(axis=1, keepdims=True)
+            value.append(v)
         
-        # Fill missing sizes (e.g. for accessories)
-        data['size'] = data['size'].fillna('NA')
+        return cls(
+            feature=np.concatenate(feature).astype(np.int32),
+            # Kept in float64: sklearn compares the float32 input against float64 thresholds
+            threshold=np.concatenate(threshold),
+            left=np.concatenate(left).astype(np.int32),
+            right=np.concatenate(right).astype(np.int32),
+            value=np.concatenate(value),
+            roots=offsets.astype(np.int32),
+            depth=max(t.max_depth for t in trees)
+        )
+
+    def predict(self, X):
+        """
+        Mean leaf value over the trees: shape (n,) for one output, else (n, n_outputs).
+        """
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        out = self.value[node].mean(axis=1)
+        return out[:, 0] if out.shape[1] == 1 else out
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right, self.value, self.roots))
+
+class RetailModelManager:
+    def __init__(self, n_jobs=None, backend='flat'):
+        """
+        n_jobs: cores used by both forests for training and inference (-1 = all).
+        backend: 'flat' scores batches of up to FLAT_MAX_ROWS rows with the compiled
+                 FlatForest copies; 'sklearn' always calls the estimators.
+        """
+        # sklearn is imported on first use, keeping it out of app start-up
+        from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
         
-        # Encode
-        for col in categorical_cols:
-            le = LabelEncoder()
-            data[col] = le.fit_transform(data[col])
-            self.encoders[col] = le
-            
-        return data, categorical_cols + numerical_cols
+        self.backend = backend
+        self._flat_models = None
+        self.demand_model = RandomForestRegressor(n_estimators=50, random_state=42, n_jobs=n_jobs)
+        self.return_model = RandomForestClassifier(n_estimators=50, random_state=42, n_jobs=n_jobs)
+        self.encoder = CategoricalEncoder()
+        self.features = FEATURES
+        self.fingerprint = None
+        self.model_version = None
+        self.is_trained = False
+        self.training_report = None
+        self._daily_sales = None
+        self._split_thresholds = {}
+        
+    @timed('prepare_features')
+    def prepare_features(self, df):
+        """
+        Encodes a frame into the model feature matrix using the fitted encoder.
+        """
+        X = np.empty((len(df), len(self.features)), dtype=np.float32)
+        for i, col in enumerate(self.features):
+            if col in self.encoder.columns:
+                X[:, i] = self.encoder.transform_column(col, df[col])
+            else:
+                X[:, i] = df[col].to_numpy()
+        return X
 
-    def train(self, df):
+    @timed('train')
+    def train(self, df, window_days=None):
         """
-        Trains both demand and return models.
+        Trains both demand and return models from scratch.
+        window_days: only use the most recent window_days of history.
         """
+        started = time.perf_counter()
+        if window_days is not None:
+            cutoff = df['purchase_date'].max() - pd.Timedelta(days=window_days)
+            df = df[df['purchase_date'] > cutoff]
+        
+        # One vocabulary for both models, fitted on the transaction frame
+        # (a superset of the labels in the daily aggregate)
+        self.encoder = CategoricalEncoder().fit(df)
+        
         # 1. Demand Model (Predicting Sales Volume? Or likelihood of sale?)
         # Since our data is Transactional, we aggregate to simulate "Units Sold per Product/Day"
         # For simplicity in this demo, let's predict "Daily Units Sold" based on attributes + price.
         
-        # Aggregate by Date + Product
-        daily_sales = df.groupby(['purchase_date', 'product_id', 'brand', 'category', 'season', 'current_price', 'markdown_percentage', 'original_price', 'size', 'color']).size().reset_index(name='units_sold')
+        # Aggregate by Date + Product (kept for incremental updates)
+        daily_sales = aggregate_daily_sales(df)
         
         # For 'Return', we use the transactional data directly (probability of this item being returned)
         
         # Train Demand Model
-        X_demand_df, features = self.prepare_features(daily_sales)
-        X = X_demand_df[features]
+        X = self.prepare_features(daily_sales)
         y = daily_sales['units_sold']
         
+        self.demand_model.set_params(warm_start=False, n_estimators=50)
         self.demand_model.fit(X, y)
         
         # Train Return Model
         # Target: is_returned (boolean)
         # Use main transaction df
-        X_return_df, features_ret = self.prepare_features(df)
-        X_ret = X_return_df[features] # Same features
+        X_ret = self.prepare_features(df)
         y_ret = df['is_returned'].astype(int)
         
+        self.return_model.set_params(warm_start=False, n_estimators=50)
         self.return_model.fit(X_ret, y_ret)
         
-        self.is_trained = True
+        self._daily_sales = daily_sales
+        self._finish_training(data_fingerprint(df), {
+            'mode': 'window' if window_days is not None else 'full',
+            'seconds': time.perf_counter() - started,
+            'rows': len(df),
+            'daily_rows': len(daily_sales)
+        })
         return self.demand_model.feature_importances_
 
+    def train_incremental(self, new_df, n_new_trees=10):
+        """
+        Adds n_new_trees to each forest (warm start), fitted on the new transactions only.
+        Only the days touched by new_df are re-aggregated into the cached daily sales.
+        The encoder stays frozen: labels first seen in new_df map to UNKNOWN_CODE.
+        Pass rows as stored in the dataset so the fingerprint keeps matching it.
+        Returns the training report.
+        """
+        if not self.is_trained or self._daily_sales is None:
+            raise Exception("Model not trained")
+        
+        started = time.perf_counter()
+        
+        # Re-aggregate only from the first new day on
+        first_day = new_df['purchase_date'].min()
+        history = self._daily_sales
+        touched = history['purchase_date'] >= first_day
+        new_daily = aggregate_daily_sales(new_df)
+        if touched.any():
+            merged = pd.concat([history[touched], new_daily], ignore_index=True)
+            new_daily = merged.groupby(DAILY_KEYS, observed=True, as_index=False)['units_sold'].sum()
+        self._daily_sales = pd.concat([history[~touched], new_daily], ignore_index=True)
+        
+        # Demand: new trees see the refreshed days
+        self.demand_model.set_params(warm_start=True, n_estimators=len(self.demand_model.estimators_) + n_new_trees)
+        self.demand_model.fit(self.prepare_features(new_daily), new_daily['units_sold'])
+        self.demand_model.set_params(warm_start=False)
+        
+        # Returns: a batch without both outcomes would change the forest's classes
+        y_ret = new_df['is_returned'].astype(int)
+        return_trees = 0
+        if y_ret.nunique() == len(self.return_model.classes_):
+            self.return_model.set_params(warm_start=True, n_estimators=len(self.return_model.estimators_) + n_new_trees)
+            self.return_model.fit(self.prepare_features(new_df), y_ret)
+            self.return_model.set_params(warm_start=False)
+            return_trees = n_new_trees
+        
+        self._finish_training(combine_fingerprints(self.fingerprint, data_fingerprint(new_df)), {
+            'mode': 'incremental',
+            'seconds': time.perf_counter() - started,
+            'rows': len(new_df),
+            'daily_rows': len(new_daily),
+            'return_trees_added': return_trees
+        })
+        return self.training_report
+
+    def _finish_training(self, fingerprint, report):
+        report['n_estimators'] = {
+            'demand': len(self.demand_model.estimators_),
+            'return': len(self.return_model.estimators_)
+        }
+        self.training_report = report
+        self.fingerprint = fingerprint
+        self.model_version = uuid.uuid4().hex
+        self._split_thresholds = {}
+        self._flat_models = self.compile_flat()
+        self.is_trained = True
+        OPTIMIZATION_CACHE.clear()
+
+    def save(self, path=ARTIFACT_PATH):
+        """
+        Persists both models, the encoder, the feature order and the training data fingerprint.
+        """
+        import joblib
+        import sklearn
+        
+        if not self.is_trained:
+            raise Exception("Model not trained")
+        
+        artifact = {
+            'artifact_version': ARTIFACT_VERSION,
+            'sklearn_version': sklearn.__version__,
+            'fingerprint': self.fingerprint,
+            'model_version': self.model_version,
+            'features': self.features,
+            'encoder': self.encoder,
+            'demand_model': self.demand_model,
+            'return_model': self.return_model,
+            'flat_models': self._flat_models,
+            'daily_sales': self._daily_sales
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Uncompressed so the estimator arrays can be memory-mapped on load;
+        # written aside and renamed so readers never see a partial file
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        joblib.dump(artifact, tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path=ARTIFACT_PATH, fingerprint=None, n_jobs=None):
+        """
+        Loads a saved artifact. Returns None when it is missing, unreadable,
+        from another version, or (if `fingerprint` is given) trained on other data.
+        """
+        import joblib
+        import sklearn
+        
+        if not os.path.exists(path):
+            return None
+        try:
+            artifact = joblib.load(path, mmap_mode='r')
+        except Exception:
+            return None
+        
+        if artifact.get('artifact_version') != ARTIFACT_VERSION:
+            return None
+        if artifact.get('sklearn_version') != sklearn.__version__:
+            return None
+        if fingerprint is not None and artifact.get('fingerprint') != fingerprint:
+            return None
+        
+        manager = cls(n_jobs=n_jobs)
+        manager.demand_model = artifact['demand_model']
+        manager.return_model = artifact['return_model']
+        manager.set_n_jobs(n_jobs)
+        manager.encoder = artifact['encoder']
+        manager.features = artifact['features']
+        manager.fingerprint = artifact['fingerprint']
+        manager.model_version = artifact['model_version']
+        manager._daily_sales = artifact['daily_sales']
+        # Node arrays stay memory-mapped from the artifact
+        manager._flat_models = artifact['flat_models']
+        manager.is_trained = True
+        return manager
+
+    @classmethod
+    def load_or_train(cls, df, path=ARTIFACT_PATH, n_jobs=None):
+        """
+        Returns a manager for `df`, reusing the saved artifact when it is still valid
+        and training (then saving) otherwise.
+        """
+        manager = cls.load(path, fingerprint=data_fingerprint(df), n_jobs=n_jobs)
+        if manager is not None:
+            return manager
+        
+        manager = cls(n_jobs=n_jobs)
+        manager.train(df)
+        try:
+            manager.save(path)
+        except OSError:
+            # Read-only filesystem: keep serving the in-memory model
+            pass
+        return manager
+
+    @timed('predict_optimization')
     def predict_optimization(self, product_row, price_range):
         """
         Simulate demand and revenue for a range of prices for a specific product context.
@@ -71,65 +433,511 @@ class RetailModelManager:
         """
         if not self.is_trained:
             raise Exception("Model not trained")
-            
-        results = []
         
         # Prepare base input vector
-        # We need to encode the input 'product_row' using saved encoders
-        input_data = product_row.copy()
-        for col, le in self.encoders.items():
-            if col in input_data:
-                # Handle unseen labels carefully, or just try/except
-                try:
-                    input_data[col] = le.transform([input_data[col]])[0]
-                except:
-                    input_data[col] = 0 # Fallback
-        
-        for price in price_range:
-            # Calculate markdown
-            orig = input_data['original_price']
-            markdown = (orig - price) / orig if orig > 0 else 0
-            
-            # Construct feature vector
-            # Order must match training: ['brand', 'category', 'season', 'size', 'color', 'current_price', 'markdown_percentage', 'original_price']
-            features = [
-                input_data['brand'],
-                input_data['category'],
-                input_data['season'],
-                input_data['size'],
-                input_data['color'],
-                price,
-                markdown,
-                input_data['original_price']
+        # Unseen labels map to the encoder's explicit UNKNOWN_CODE
+        context = {col: np.array([self.encoder.transform_value(col, product_row.get(col))])
+                   for col in self.encoder.columns}
+        context['original_price'] = np.array([float(product_row['original_price'])])
+        
+        prices = np.asarray(price_range, dtype=float)
+        pred_demand, revenue, pred_return_prob, adj_revenue = self._score_grid(context, prices[None, :])
+        
+        return pd.DataFrame({
+            'price': prices,
+            'demand': pred_demand[0],
+            'revenue': revenue[0],
+            'return_prob': pred_return_prob[0],
+            'adjusted_revenue': adj_revenue[0]
+        })
+
+    def cached_optimization(self, product_row, price_range):
+        """
+        Price sweep plus exact optimum for one context, memoized in OPTIMIZATION_CACHE.
+        Returns (sweep DataFrame, best row dict); callers must not modify them.
+        """
+        prices = np.asarray(price_range, dtype=float)
+        # Keyed on the encoded codes, which is all the models see: labels the encoder
+        # does not know share the UNKNOWN_CODE entry, and no two scored rows collide
+        key = (
+            self.model_version,
+            tuple(self.encoder.transform_value(col, product_row.get(col)) for col in self.encoder.columns),
+            float(product_row['original_price']),
+            tuple(prices)
+        )
+        
+        def compute():
+            sweep = self.predict_optimization(product_row, prices)
+            best = self.find_optimal_price(product_row, prices[0], prices[-1], method='thresholds')
+            return sweep, best
+        
+        return OPTIMIZATION_CACHE.get_or_compute(key, compute)
+
+    def find_optimal_price(self, product_row, low, high, method='thresholds', n_points=20, rounds=3):
+        """
+        Searches [low, high] for the price maximizing risk-adjusted revenue.
+        method:
+          'grid'       - n_points evenly spaced prices (what the page used to do)
+          'refine'     - coarse-to-fine: re-grid n_points around the best point, `rounds` times
+          'thresholds' - exact: the forests are piecewise constant in price, so only the
+                         edges of the regions cut by their current_price/markdown splits
+                         are evaluated (within float32 resolution of the split values)
+        Returns the best row of the sweep as a dict plus the number of 'evaluations'.
+        """
+        low, high = float(low), float(high)
+        if method == 'grid':
+            sweep = self.predict_optimization(product_row, np.linspace(low, high, n_points))
+            evaluations = len(sweep)
+        elif method == 'refine':
+            evaluations = 0
+            lo, hi = low, high
+            best_rows = []
+            for _ in range(rounds):
+                prices = np.linspace(lo, hi, n_points)
+                sweep = self.predict_optimization(product_row, prices)
+                evaluations += len(sweep)
+                i = int(sweep['adjusted_revenue'].idxmax())
+                best_rows.append(sweep.loc[i])
+                # Bracket the best point by its neighbours and zoom in
+                lo, hi = prices[max(i - 1, 0)], prices[min(i + 1, n_points - 1)]
+            sweep = pd.DataFrame(best_rows).reset_index(drop=True)
+        elif method == 'thresholds':
+            prices = self.price_breakpoints(float(product_row['original_price']), low, high)
+            sweep = self.predict_optimization(product_row, prices)
+            evaluations = len(sweep)
+        else:
+            raise ValueError(f"Unknown search method: {method}")
+        
+        best = sweep.loc[sweep['adjusted_revenue'].idxmax()].to_dict()
+        best['evaluations'] = evaluations
+        return best
+
+    def price_breakpoints(self, original_price, low, high):
+        """
+        Candidate prices in [low, high] covering every constant region of both forests:
+        the bounds plus a point just either side of each split on current_price or markdown.
+        Revenue grows with price inside a region, so the best of these is the optimum.
+        """
+        cuts = [self.split_thresholds('current_price')]
+        if original_price > 0:
+            # markdown <= t  <=>  price >= original_price * (1 - t)
+            cuts.append(original_price * (1 - self.split_thresholds('markdown_percentage')))
+        cuts = np.concatenate(cuts)
+        cuts = cuts[(cuts > low) & (cuts < high)]
+        
+        # Step well past float32 rounding (the trees compare float32 features)
+        eps = 1e-6
+        candidates = np.concatenate([[low, high], cuts * (1 - eps), cuts * (1 + eps)])
+        return np.unique(np.clip(candidates, low, high))
+
+    def split_thresholds(self, feature):
+        """
+        Sorted distinct split values on `feature` across both forests (cached per fit).
+        """
+        if feature not in self._split_thresholds:
+            idx = self.features.index(feature)
+            values = [
+                est.tree_.threshold[est.tree_.feature == idx]
+                for model in (self.demand_model, self.return_model)
+                for est in model.estimators_
             ]
-            
-            # Predict Demand (Units)
-            pred_demand = self.demand_model.predict([features])[0]
-            # Predict Return Prob
-            pred_return_prob = self.return_model.predict_proba([features])[0][1]
-            
-            # Heuristic adjustment: Demand shouldn't be effectively zero near 0 price, but let's trust the forest
-            # Smooth it a bit
-            pred_demand = max(0.01, pred_demand)
-            
-            revenue = price * pred_demand
-            adj_revenue = revenue * (1 - pred_return_prob)
-            
-            results.append({
-                'price': price,
-                'demand': pred_demand,
-                'revenue': revenue,
-                'return_prob': pred_return_prob,
-                'adjusted_revenue': adj_revenue
+            self._split_thresholds[feature] = np.unique(np.concatenate(values))
+        return self._split_thresholds[feature]
+
+    def set_n_jobs(self, n_jobs):
+        """
+        Changes the number of cores used by both forests.
+        """
+        self.demand_model.n_jobs = n_jobs
+        self.return_model.n_jobs = n_jobs
+
+    def predict_optimization_many(self, product_rows, price_ranges):
+        """
+        predict_optimization for several contexts, each with its own price range,
+        in a single prediction call per model. Returns one DataFrame per context.
+        """
+        if not self.is_trained:
+            raise Exception("Model not trained")
+        
+        prices = [np.asarray(p, dtype=float) for p in price_ranges]
+        sizes = [len(p) for p in prices]
+        context = {
+            col: np.repeat([self.encoder.transform_value(col, row.get(col)) for row in product_rows], sizes)
+            for col in self.encoder.columns
+        }
+        context['original_price'] = np.repeat([float(row['original_price']) for row in product_rows], sizes)
+        flat_prices = np.concatenate(prices) if prices else np.zeros(0)
+        
+        scores = self._score_flat(context, flat_prices)
+        bounds = np.cumsum(sizes)[:-1]
+        demand, revenue, return_prob, adj_revenue = (np.split(a, bounds) for a in scores)
+        return [
+            pd.DataFrame({
+                'price': p,
+                'demand': d,
+                'revenue': r,
+                'return_prob': rp,
+                'adjusted_revenue': ar
             })
+            for p, d, r, rp, ar in zip(prices, demand, revenue, return_prob, adj_revenue)
+        ]
+
+    def optimize_batch(self, contexts, price_grid=None, chunk_size=1000, output_path=None, n_workers=None):
+        """
+        Finds the best price for every product context in one batched run.
+        contexts: frame with the categorical feature columns and 'original_price'
+                  (other columns, e.g. 'product_id', are passed through).
+        price_grid: candidate prices as fractions of each context's original price
+                    (default: 0.4 to 1.0, 20 points, as in the optimizer page).
+        Evaluates chunk_size contexts x grid per prediction call. With output_path the
+        results are appended to that CSV chunk by chunk and the path is returned;
+        otherwise a DataFrame is returned.
+        n_workers: shard the chunks across that many processes. Each worker receives
+                   the fitted models once at startup, not with every task.
+        """
+        if not self.is_trained:
+            raise Exception("Model not trained")
+        
+        grid = np.asarray(price_grid if price_grid is not None else np.linspace(0.4, 1.0, 20), dtype=float)
+        
+        shards = (contexts.iloc[start:start + chunk_size] for start in range(0, len(contexts), chunk_size))
+        
+        chunks = []
+        out = open(output_path, 'w', newline='') if output_path else None
+        pool = None
+        try:
+            if n_workers and n_workers > 1:
+                pool = ProcessPoolExecutor(n_workers, initializer=_init_batch_worker, initargs=(self,))
+                # Bounded window of in-flight shards: slices are copied and results held
+                # only a few chunks ahead of the writer
+                results = _map_bounded(pool, _optimize_shard, shards, 2 * n_workers, grid)
+            else:
+                results = (self._optimize_chunk(shard, grid) for shard in shards)
             
-        return pd.DataFrame(results)
+            for i, chunk in enumerate(results):
+                if out is not None:
+                    chunk.to_csv(out, header=(i == 0), index=False)
+                else:
+                    chunks.append(chunk)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if out is not None:
+                out.close()
+        
+        if out is not None:
+            return output_path
+        if not chunks:
+            return self._optimize_chunk(contexts.iloc[:0], grid)
+        return pd.concat(chunks, ignore_index=True)
+
+    def _optimize_chunk(self, contexts, grid):
+        """
+        Scores one chunk of contexts over the relative price grid and keeps the argmax per context.
+        """
+        context = {col: self.encoder.transform_column(col, contexts[col]) for col in self.encoder.columns}
+        orig = contexts['original_price'].to_numpy(dtype=float)
+        context['original_price'] = orig
+        prices = orig[:, None] * grid[None, :]
+        
+        demand, revenue, return_prob, adj_revenue = self._score_grid(context, prices)
+        
+        rows = np.arange(len(contexts))
+        best = adj_revenue.argmax(axis=1) if len(contexts) else np.zeros(0, dtype=int)
+        result = contexts.reset_index(drop=True)
+        result['best_price'] = prices[rows, best]
+        result['best_markdown'] = 1 - grid[best]
+        result['demand'] = demand[rows, best]
+        result['return_prob'] = return_prob[rows, best]
+        result['revenue'] = revenue[rows, best]
+        result['adjusted_revenue'] = adj_revenue[rows, best]
+        return result
 
-    def predict_return_risk(self, product_context):
+    def _score_grid(self, context, prices):
         """
-        Predict return probability for a single item context.
+        Predicts demand, revenue, return probability and risk-adjusted revenue
+        for encoded contexts (arrays of length n) over an (n, k) price grid.
+        Returns four (n, k) arrays.
+        """
+        n, k = prices.shape
+        flat_context = {col: np.repeat(values, k) for col, values in context.items()}
+        return tuple(a.reshape(n, k) for a in self._score_flat(flat_context, prices.ravel()))
+
+    def _score_flat(self, context, prices):
+        """
+        Same as _score_grid for row-aligned context arrays and prices (all of length m).
+        """
+        orig = context['original_price']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            markdown = np.where(orig > 0, (orig - prices) / orig, 0.0)
+        
+        # Columns follow the training feature order
+        varying = {'current_price': prices, 'markdown_percentage': markdown}
+        X = np.empty((len(prices), len(self.features)), dtype=np.float32)
+        for i, col in enumerate(self.features):
+            X[:, i] = varying[col] if col in varying else context[col]
+        
+        # One call per model for the whole grid
+        pred_demand, pred_return_prob = self._predict_arrays(X)
+        
+        # Heuristic adjustment: Demand shouldn't be effectively zero near 0 price, but let's trust the forest
+        # Smooth it a bit
+        pred_demand = np.maximum(0.01, pred_demand)
+        
+        revenue = prices * pred_demand
+        adj_revenue = revenue * (1 - pred_return_prob)
+        return pred_demand, revenue, pred_return_prob, adj_revenue
+
+    def compile_flat(self):
+        """
+        Compiles both fitted forests to (demand, return) FlatForest copies.
+        """
+        return FlatForest.from_sklearn(self.demand_model), FlatForest.from_sklearn(self.return_model)
+
+    def _predict_arrays(self, X):
+        """
+        Returns (demand, return probability) arrays for a feature matrix.
+        """
+        if self._use_flat(X):
+            demand_flat, _ = self._flat_models
+            return demand_flat.predict(X), self._predict_return_prob(X)
+        return self.demand_model.predict(X), self._predict_return_prob(X)
+
+    def _predict_return_prob(self, X):
+        if self._use_flat(X):
+            return self._flat_models[1].predict(X)[:, 1]
+        return self.return_model.predict_proba(X)[:, 1]
+
+    def _use_flat(self, X):
+        return self.backend == 'flat' and self._flat_models is not None and len(X) <= FLAT_MAX_ROWS
+
+    def predict_return_risk(self, items):
         """
-        if not self.is_trained: return 0.0
-        # ... logic similar to above ...
-        # Simplified for now
-        return 0.15 # Placeholder
+        Return probability for one item context (dict -> float) or a frame of items
+        (DataFrame -> array), scored with a single predict_proba call.
+        Missing current_price defaults to original_price (no markdown).
+        """
+        if not self.is_trained:
+            raise Exception("Model not trained")
+        
+        single = isinstance(items, dict)
+        frame = pd.DataFrame([items]) if single else items
+        X = self.prepare_features(_item_frame(frame, self.encoder.columns))
+        risk = self._predict_return_prob(X)
+        return float(risk[0]) if single else risk
+
+    def return_risk_table(self, df):
+        """
+        Per-product return risk, indexed by product_id: the mean predicted risk over the
+        product's distinct item contexts in df (one batched pass), next to its observed
+        return rate. Sorted from riskiest.
+        """
+        if not self.is_trained:
+            raise Exception("Model not trained")
+        
+        items = df[['product_id', 'brand', 'category', 'is_returned'] + [
+            col for col in self.features if col not in ('brand', 'category')
+        ]]
+        observed = items.groupby('product_id', observed=True)['is_returned'].mean()
+        contexts = items.drop(columns='is_returned').drop_duplicates()
+        contexts = contexts.assign(return_risk=self.predict_return_risk(contexts))
+        
+        table = contexts.groupby('product_id', observed=True).agg(
+            brand=('brand', 'first'),
+            category=('category', 'first'),
+            original_price=('original_price', 'max'),
+            contexts=('return_risk', 'size'),
+            return_risk=('return_risk', 'mean'),
+            max_risk=('return_risk', 'max')
+        )
+        table['observed_return_rate'] = observed.reindex(table.index).to_numpy()
+        return table.sort_values('return_risk', ascending=False, kind='stable')
+
+def _item_frame(frame, categorical_columns):
+    """
+    Fills the columns an item context may omit: unknown labels and a full-price sale.
+    """
+    fills = {col: None for col in categorical_columns if col not in frame}
+    if 'current_price' not in frame:
+        fills['current_price'] = frame['original_price']
+    if 'markdown_percentage' not in frame:
+        current = fills.get('current_price', frame.get('current_price'))
+        fills['markdown_percentage'] = 1 - np.asarray(current, dtype=float) / np.asarray(frame['original_price'], dtype=float)
+    return frame.assign(**fills) if fills else frame
+
+class ModelRegistry:
+    """
+    Holds the RetailModelManager currently serving requests.
+    Loading/training runs in a background thread and the finished manager is swapped in
+    with a single reference assignment, so readers see either the old model or the new
+    one, never a half-trained one.
+    """
+    def __init__(self):
+        self._manager = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self.status = 'empty' # 'warming' until a first model is ready, then 'ready' or 'failed'
+        self.error = None
+        self.failures = 0
+        self._failed_at = None
+
+    def get(self):
+        """
+        The serving manager, or None while the first model is warming up.
+        """
+        return self._manager
+
+    def swap(self, manager):
+        """
+        Atomically replaces the serving manager.
+        """
+        self._manager = manager
+        self.status = 'ready'
+        self.error = None
+        self.failures = 0
+        OPTIMIZATION_CACHE.clear()
+
+    def start(self, build, background=True):
+        """
+        Runs build() -> trained RetailModelManager and swaps in the result.
+        Returns the thread (None when run inline). A build already in flight is reused.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self._thread
+            if self._manager is None:
+                self.status = 'warming'
+            if not background:
+                self._thread = None
+                self._run(build)
+                return None
+            self._thread = threading.Thread(target=self._run, args=(build,), name='model-training', daemon=True)
+            self._thread.start()
+            return self._thread
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the build in flight (if any) finishes; returns the serving manager.
+        """
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self._manager
+
+    def _run(self, build):
+        try:
+            self.swap(build())
+        except Exception as e:
+            # Keep serving the last good model, if any
+            logger.exception("Model training failed")
+            self.error = e
+            self.failures += 1
+            self._failed_at = time.monotonic()
+            if self._manager is None:
+                self.status = 'failed'
+
+    def retry_due(self):
+        """
+        True once a failed first build has waited out its backoff
+        (RETRY_BASE_SECONDS, doubling per consecutive failure up to RETRY_MAX_SECONDS).
+        """
+        if self.status != 'failed' or self._failed_at is None:
+            return False
+        backoff = min(RETRY_BASE_SECONDS * 2 ** (self.failures - 1), RETRY_MAX_SECONDS)
+        return time.monotonic() - self._failed_at >= backoff
+
+_registry = ModelRegistry()
+
+def get_model_registry():
+    """
+    Returns the process-wide ModelRegistry.
+    """
+    return _registry
+
+def get_model_manager():
+    """
+    Returns the serving RetailModelManager, or None while it is warming up.
+    """
+    return _registry.get()
+
+def _model_info():
+    manager = _registry.get()
+    version = manager.model_version if manager is not None else ''
+    return [((version, _registry.status), 1)]
+
+register(Gauge('retail_model_info', "Serving model version and registry status.", _model_info, ('version', 'status')))
+
+def get_return_risk_table():
+    """
+    Per-product return risk of the shared dataset under the serving model,
+    computed once per (model, dataset) version. None while the model is warming up.
+    """
+    manager = get_model_manager()
+    if manager is None:
+        return None
+    # Version and frame read together, so the table is never cached under another version
+    version, df = get_snapshot()
+    return RISK_TABLE_CACHE.get_or_compute((manager.model_version, version), lambda: manager.return_risk_table(df))
+
+def start_model_training(build=None, background=True):
+    """
+    Loads (or trains) the model for the shared dataset off the request path.
+    """
+    if build is None:
+        build = lambda: RetailModelManager.load_or_train(get_dataset())
+    return _registry.start(build, background=background)
+
+def load_saved_model(path=ARTIFACT_PATH):
+    """
+    Swaps in the saved artifact if it was trained on the shared dataset; never trains.
+    Returns the manager, or None when there is no valid artifact.
+    """
+    manager = RetailModelManager.load(path, fingerprint=data_fingerprint(get_dataset()))
+    if manager is not None:
+        _registry.swap(manager)
+    return manager
+
+def ensure_model_training():
+    """
+    Starts loading/training the serving model once, on first need; later calls
+    (and calls while it is warming) do nothing, except that a failed build is
+    retried with backoff. Returns the registry.
+    """
+    if _registry.status == 'empty' or _registry.retry_due():
+        start_model_training()
+    return _registry
+
+# Model of an optimize_batch worker process, set once by the pool initializer
+_batch_worker_manager = None
+
+def _init_batch_worker(manager):
+    global _batch_worker_manager
+    # The pool already spreads work over the cores
+    manager.set_n_jobs(1)
+    _batch_worker_manager = manager
+
+def _optimize_shard(contexts, grid):
+    return _batch_worker_manager._optimize_chunk(contexts, grid)
+
+def _map_bounded(pool, func, items, window, *args):
+    """
+    Ordered pool.map over a lazy iterable with at most `window` tasks in flight:
+    the next item is submitted only once the oldest result has been consumed.
+    """
+    pending = deque()
+    for item in items:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(pool.submit(func, item, *args))
+    while pending:
+        yield pending.popleft().result()
+
+if __name__ == "__main__":
+    # python -m app.model: trains (or validates) and saves the serving artifact.
+    # Through the package module, so the artifact pickles app.model classes, not __main__ ones
+    from app import model
+    from app.data_manager import load_data
+
+    print("Loading or training the retail models...")
+    manager = model.RetailModelManager.load_or_train(load_data())
+    print(f"Model {manager.model_version} saved at {model.ARTIFACT_PATH}")
@@ -3,60 +3,114 @@ import dash
 from dash import html, dash_table, dcc
 import dash_bootstrap_components as dbc
 import pandas as pd
-from app.data_manager import load_data
+from urllib.parse import urlencode
+from app.data_manager import get_dataset, get_snapshot, get_store, memory_report
+from app.table_query import query_page
+from app.metrics import timed_callback
 
 dash.register_page(__name__)
 
-df = load_data()
-
-layout = dbc.Container([
-    html.H2("Dataset Overview", className="my-4"),
+def layout():
+    df = get_dataset()
+    memory = memory_report(df)
+    options = get_store().aggregate('filter_options')
+    return dbc.Container([
+        html.H2("Dataset Overview", className="my-4"),
+    
+        dbc.Alert(
+            "This dataset contains synthetic retail transactions designed to mimic real-world fashion boutique operations.",
+            color="info"
+        ),
     
-    dbc.Alert(
-        "This dataset contains synthetic retail transactions designed to mimic real-world fashion boutique operations.",
-        color="info"
-    ),
+        html.H4("Transactions"),
+        # Paged, sorted and filtered on the server: each fetch sends only the visible rows
+        dash_table.DataTable(
+            id='dataset-table',
+            columns=[{"name": i, "id": i} for i in df.columns],
+            page_current=0,
+            page_size=10,
+            page_action='custom',
+            sort_action='custom',
+            sort_mode='single',
+            sort_by=[],
+            filter_action='custom',
+            filter_query='',
+            style_table={'overflowX': 'auto'},
+            style_cell={'textAlign': 'left'},
+            style_header={
+                'backgroundColor': 'rgb(230, 230, 230)',
+                'fontWeight': 'bold'
+            }
+        ),
+        html.Small(id='dataset-table-count', className="text-muted"),
     
-    html.H4("First 100 Rows"),
-    dash_table.DataTable(
-        data=df.head(100).to_dict('records'),
-        columns=[{"name": i, "id": i} for i in df.columns],
-        page_size=10,
-        style_table={'overflowX': 'auto'},
-        style_cell={'textAlign': 'left'},
-        style_header={
-            'backgroundColor': 'rgb(230, 230, 230)',
-            'fontWeight': 'bold'
-        }
-    ),
+        html.Br(),
+        html.H4("Data Dictionary"),
+        dbc.Table.from_dataframe(pd.DataFrame({
+            "Column": ["product_id", "category", "brand", "season", "original_price", "current_price", "is_returned"],
+            "Description": [
+                "Unique identifier", 
+                "Apparel category (Dresses, Tops, etc.)",
+                "Manufacturer brand",
+                "Intended Season",
+                "MSRP / Base Price",
+                "Final Transaction Price",
+                "True if item was returned"
+            ]
+        }), striped=True, bordered=True, hover=True),
     
-    html.Br(),
-    html.H4("Data Dictionary"),
-    dbc.Table.from_dataframe(pd.DataFrame({
-        "Column": ["product_id", "category", "brand", "season", "original_price", "current_price", "is_returned"],
-        "Description": [
-            "Unique identifier", 
-            "Apparel category (Dresses, Tops, etc.)",
-            "Manufacturer brand",
-            "Intended Season",
-            "MSRP / Base Price",
-            "Final Transaction Price",
-            "True if item was returned"
-        ]
-    }), striped=True, bordered=True, hover=True),
+        html.Br(),
+        html.H4("Memory Footprint"),
+        html.P(
+            f"{memory['Bytes'].sum() / 1e6:.2f} MB in memory, "
+            f"{memory['Bytes'].sum() / max(len(df), 1):.1f} bytes per row ({len(df):,} rows)",
+            className="text-muted"
+        ),
+        dbc.Table.from_dataframe(memory, striped=True, bordered=True, hover=True, size="sm"),
     
-    dbc.Button("Download Full CSV", id="btn-download", color="success", className="mt-3"),
-    dcc.Download(id="download-dataframe-csv"),
+        html.Br(),
+        html.H4("Export"),
+        dbc.Row([
+            dbc.Col(dcc.Dropdown(id='export-brand', options=options['brands'], multi=True, placeholder="All Brands"), md=4),
+            dbc.Col(dcc.Dropdown(id='export-category', options=options['categories'], multi=True, placeholder="All Categories"), md=4),
+            dbc.Col(dcc.Dropdown(id='export-season', options=options['seasons'], multi=True, placeholder="All Seasons"), md=4),
+        ]),
+        dbc.Checkbox(id='export-gzip', label="Gzip compressed", value=False, className="mt-2"),
+        # A plain link: the server streams the file in chunks instead of the callback
+        # building the whole CSV in memory
+        dbc.Button("Download CSV", id="btn-download", href="/download/retail_data.csv",
+                   external_link=True, color="success", className="mt-3"),
 
-], fluid=True)
+    ], fluid=True)
 
-# Note: Download callback would go here or in a separate callbacks file if needed. 
-# For simplicity with Dash Pages, we can define callback here.
 from dash import callback, Output, Input
 @callback(
-    Output("download-dataframe-csv", "data"),
-    Input("btn-download", "n_clicks"),
-    prevent_initial_call=True,
+    [Output('dataset-table', 'data'),
+     Output('dataset-table', 'page_count'),
+     Output('dataset-table-count', 'children')],
+    [Input('dataset-table', 'page_current'),
+     Input('dataset-table', 'page_size'),
+     Input('dataset-table', 'sort_by'),
+     Input('dataset-table', 'filter_query')]
+)
+@timed_callback
+def update_dataset_table(page_current, page_size, sort_by, filter_query):
+    version, data = get_snapshot()
+    records, page_count, total = query_page(('dataset', version), data, page_current, page_size, sort_by, filter_query)
+    return records, page_count, f"{total:,} matching rows"
+
+@callback(
+    Output("btn-download", "href"),
+    [Input("export-brand", "value"),
+     Input("export-category", "value"),
+     Input("export-season", "value"),
+     Input("export-gzip", "value")]
 )
-def func(n_clicks):
-    return dcc.send_data_frame(df.to_csv, "retail_data.csv")
+@timed_callback
+def update_download_link(brands, categories, seasons, gzip):
+    query = [('brand', b) for b in brands or []]
+    query += [('category', c) for c in categories or []]
+    query += [('season', s) for s in seasons or []]
+    if gzip:
+        query.append(('gzip', '1'))
+    return "/download/retail_data.csv" + (f"?{urlencode(query)}" if query else "")
@@ -1,62 +1,96 @@
 
 import dash
-from dash import dcc, html, dash_table
+from dash import dcc, html, dash_table, callback, Output, Input
 import dash_bootstrap_components as dbc
+import numpy as np
 import pandas as pd
-from app.data_manager import load_data
+from app.cache import LRUCache
+from app.data_manager import INVENTORY_COLUMNS, get_snapshot
+from app.table_query import query_page
+from app.metrics import register_cache, timed_callback
 
 dash.register_page(__name__)
 
-df = load_data()
+# The view with its Status column, built once per dataset version
+VIEW_CACHE = register_cache('inventory_view', LRUCache(maxsize=2))
 
-# Inventory Mockup (Aggregate stock from latest entries per product)
-# Since our data is transactional, we'll take the 'stock_quantity' from the most recent transaction for each product
-latest_stock = df.sort_values('purchase_date').groupby('product_id').last().reset_index()
-inventory_view = latest_stock[['product_id', 'brand', 'category', 'stock_quantity', 'current_price']].head(50)
+def inventory_view():
+    """
+    (version, latest stock entry per product with its Status). The snapshot is
+    maintained by the data layer and refreshed when new transactions are ingested.
+    """
+    version, snapshot = get_snapshot('inventory')
+    return version, VIEW_CACHE.get_or_compute(version, lambda: build_inventory_view(snapshot))
 
-# Add Status
-def get_status(q):
-    if q < 10: return 'Low Stock'
-    if q > 40: return 'Overstocked'
-    return 'Healthy'
+def build_inventory_view(snapshot):
+    """
+    Inventory columns of the snapshot plus the stock Status label.
+    """
+    view = snapshot[INVENTORY_COLUMNS]
+    # Add Status: below 10 is low stock, above 40 overstocked
+    q = view['stock_quantity'].to_numpy()
+    view['Status'] = np.select([q < 10, q > 40], ['Low Stock', 'Overstocked'], 'Healthy')
+    return view
 
-inventory_view['Status'] = inventory_view['stock_quantity'].apply(get_status)
-
-layout = dbc.Container([
-    html.H2("Inventory Management", className="my-4"),
+def layout():
+    _, inventory = inventory_view()
+    
+    return dbc.Container([
+        html.H2("Inventory Management", className="my-4"),
     
-    dbc.Row([
-        dbc.Col(dbc.Card([
-            dbc.CardBody([
-                html.H4("Total Items in Stock"),
-                html.H2(f"{inventory_view['stock_quantity'].sum()}", className="text-primary")
-            ])
-        ], className="text-center"), md=4),
+        dbc.Row([
+            dbc.Col(dbc.Card([
+                dbc.CardBody([
+                    html.H4("Total Items in Stock"),
+                    html.H2(f"{inventory['stock_quantity'].sum()}", className="text-primary")
+                ])
+            ], className="text-center"), md=4),
         
-        dbc.Col(dbc.Card([
-            dbc.CardBody([
-                html.H4("Low Stock Alerts"),
-                html.H2(f"{sum(inventory_view['Status']=='Low Stock')}", className="text-danger")
-            ])
-        ], className="text-center"), md=4),
-    ], className="mb-4"),
+            dbc.Col(dbc.Card([
+                dbc.CardBody([
+                    html.H4("Low Stock Alerts"),
+                    html.H2(f"{(inventory['Status'] == 'Low Stock').sum()}", className="text-danger")
+                ])
+            ], className="text-center"), md=4),
+        ], className="mb-4"),
     
-    dash_table.DataTable(
-        data=inventory_view.to_dict('records'),
-        columns=[{"name": i, "id": i} for i in inventory_view.columns],
-        page_size=15,
-        style_cell={'textAlign': 'left'},
-        style_data_conditional=[
-            {
-                'if': {'filter_query': '{Status} = "Low Stock"'},
-                'backgroundColor': '#ffcccc',
-                'color': 'red'
-            },
-            {
-                'if': {'filter_query': '{Status} = "Overstocked"'},
-                'backgroundColor': '#fff5cc',
-                'color': 'orange'
-            }
-        ]
-    )
-], fluid=True)
+        dash_table.DataTable(
+            id='inventory-table',
+            columns=[{"name": i, "id": i} for i in inventory.columns],
+            page_current=0,
+            page_size=15,
+            page_action='custom',
+            sort_action='custom',
+            sort_mode='single',
+            sort_by=[],
+            filter_action='custom',
+            filter_query='',
+            style_cell={'textAlign': 'left'},
+            style_data_conditional=[
+                {
+                    'if': {'filter_query': '{Status} = "Low Stock"'},
+                    'backgroundColor': '#ffcccc',
+                    'color': 'red'
+                },
+                {
+                    'if': {'filter_query': '{Status} = "Overstocked"'},
+                    'backgroundColor': '#fff5cc',
+                    'color': 'orange'
+                }
+            ]
+        )
+    ], fluid=True)
+
+@callback(
+    [Output('inventory-table', 'data'),
+     Output('inventory-table', 'page_count')],
+    [Input('inventory-table', 'page_current'),
+     Input('inventory-table', 'page_size'),
+     Input('inventory-table', 'sort_by'),
+     Input('inventory-table', 'filter_query')]
+)
+@timed_callback
+def update_inventory_table(page_current, page_size, sort_by, filter_query):
+    version, inventory = inventory_view()
+    records, page_count, _ = query_page(('inventory', version), inventory, page_current, page_size, sort_by, filter_query)
+    return records, page_count
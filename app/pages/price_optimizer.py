@@ -2,64 +2,60 @@
 import dash
 from dash import dcc, html, callback, Output, Input, State
 import dash_bootstrap_components as dbc
-import plotly.graph_objects as go
-import pandas as pd
 import numpy as np
-from app.data_manager import load_data, get_filter_options
-from app.model import RetailModelManager
+from app.data_manager import get_store
+from app.model import ensure_model_training, get_model_manager
+from app.metrics import timed_callback
 
 dash.register_page(__name__)
 
-df = load_data()
-options = get_filter_options(df)
-model_manager = RetailModelManager()
-# Train on load (in prod, load pickled model)
-print("Training models...")
-model_manager.train(df)
-print("Models trained.")
-
-layout = dbc.Container([
-    html.H2("Price Optimization Engine", className="my-4"),
+def layout():
+    options = get_store().aggregate('filter_options')
+    # Load the saved artifact (or train) in the background on first visit, unless the
+    # warm-up hook already did; requests see a warming message until it is swapped in
+    ensure_model_training()
+    return dbc.Container([
+        html.H2("Price Optimization Engine", className="my-4"),
     
-    dbc.Row([
-        # Input Panel
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("Configuration"),
-                dbc.CardBody([
-                    html.Label("Select Brand"),
-                    dcc.Dropdown(id='opt-brand', options=options['brands'], value=options['brands'][0]),
-                    html.Br(),
+        dbc.Row([
+            # Input Panel
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Configuration"),
+                    dbc.CardBody([
+                        html.Label("Select Brand"),
+                        dcc.Dropdown(id='opt-brand', options=options['brands'], value=options['brands'][0]),
+                        html.Br(),
                     
-                    html.Label("Select Category"),
-                    dcc.Dropdown(id='opt-category', options=options['categories'], value=options['categories'][0]),
-                    html.Br(),
+                        html.Label("Select Category"),
+                        dcc.Dropdown(id='opt-category', options=options['categories'], value=options['categories'][0]),
+                        html.Br(),
                     
-                    html.Label("Season Context"),
-                    dcc.Dropdown(id='opt-season', options=options['seasons'], value='Summer'),
-                    html.Br(),
+                        html.Label("Season Context"),
+                        dcc.Dropdown(id='opt-season', options=options['seasons'], value='Summer'),
+                        html.Br(),
                     
-                    html.Label("Base Price ($)"),
-                    dbc.Input(id='opt-base-price', type='number', value=100),
-                    html.Br(),
+                        html.Label("Base Price ($)"),
+                        dbc.Input(id='opt-base-price', type='number', value=100),
+                        html.Br(),
                     
-                    dbc.Button("Run Optimization", id='btn-optimize', color="primary", className="w-100")
-                ])
-            ], className="shadow-sm")
-        ], md=4),
+                        dbc.Button("Run Optimization", id='btn-optimize', color="primary", className="w-100")
+                    ])
+                ], className="shadow-sm")
+            ], md=4),
         
-        # Results Panel
-        dbc.Col([
-            dcc.Loading(
-                id="loading-opt",
-                children=[
-                    html.Div(id='optimization-results')
-                ],
-                type="circle",
-            )
-        ], md=8)
-    ])
-], fluid=True)
+            # Results Panel
+            dbc.Col([
+                dcc.Loading(
+                    id="loading-opt",
+                    children=[
+                        html.Div(id='optimization-results')
+                    ],
+                    type="circle",
+                )
+            ], md=8)
+        ])
+    ], fluid=True)
 
 @callback(
     Output('optimization-results', 'children'),
@@ -69,10 +65,19 @@ layout = dbc.Container([
      State('opt-season', 'value'),
      State('opt-base-price', 'value')]
 )
+@timed_callback
 def run_optimization(n_clicks, brand, category, season, base_price):
     if not n_clicks:
         return html.Div("Configure parameters and click Run to see optimization results.", className="text-muted text-center mt-5")
     
+    # Snapshot the serving model: a hot-swap mid-request cannot affect this click
+    model_manager = get_model_manager()
+    if model_manager is None:
+        registry = ensure_model_training()
+        if registry.status == 'failed':
+            return dbc.Alert(f"Model unavailable: {registry.error}", color="danger", className="mt-5")
+        return dbc.Alert("The pricing model is warming up. Please try again in a few seconds.", color="warning", className="mt-5")
+    
     # Define a generic product context
     context = {
         'brand': brand,
@@ -90,14 +95,14 @@ def run_optimization(n_clicks, brand, category, season, base_price):
     # Let's sweep actual price from 0.4*Base to 1.0*Base (0% to 60% off)
     price_range = np.linspace(float(base_price) * 0.4, float(base_price), 20)
     
-    results_df = model_manager.predict_optimization(context, price_range)
-    
-    # Find Optimal
-    best_row = results_df.loc[results_df['adjusted_revenue'].idxmax()]
+    # Find Optimal: exact search over the forests' split regions, not just the plotted grid
+    # (repeat clicks with the same inputs are served from the cache)
+    results_df, best_row = model_manager.cached_optimization(context, price_range)
     best_price = best_row['price']
     max_rev = best_row['adjusted_revenue']
     
     # Plot
+    import plotly.graph_objects as go
     fig = go.Figure()
     
     fig.add_trace(go.Scatter(
@@ -1,41 +1,92 @@
-
 import dash
-from dash import dcc, html
+from dash import dcc, html, callback, Output, Input
 import dash_bootstrap_components as dbc
-import plotly.express as px
-from app.data_manager import load_data
+from app.cache import LRUCache
+from app.data_manager import get_inventory_snapshot, get_snapshot
+from app.model import ensure_model_training, get_return_risk_table
+from app.metrics import register_cache, timed_callback
 
 dash.register_page(__name__)
 
-df = load_data()
+# Figures per dataset version, built from the incremental return summary
+FIGURE_CACHE = register_cache('return_figures', LRUCache(maxsize=4))
 
-# Returns Analysis
-return_reasons = df[df['is_returned']]['return_reason'].value_counts().reset_index()
-return_reasons.columns = ['Reason', 'Count']
+def build_return_figures(summary):
+    """
+    Return reason and per-category figures from the return summary.
+    """
+    import plotly.express as px
+    
+    # Returns Analysis
+    return_reasons = summary['by_reason'][summary['by_reason'] > 0].sort_values(ascending=False).reset_index()
+    return_reasons.columns = ['Reason', 'Count']
+    
+    fig_reasons = px.pie(return_reasons, values='Count', names='Reason', title="Return Reasons Distribution", hole=0.4)
+    fig_reasons.update_layout(template='plotly_white')
+    
+    # Returns by Category
+    by_category = summary['by_category']
+    cat_returns = (by_category['returned'] / by_category['count']).rename('is_returned').rename_axis('category').reset_index()
+    fig_cat = px.bar(cat_returns, x='category', y='is_returned', title="Return Prob by Category", color='is_returned', color_continuous_scale='RdYlGn_r')
+    fig_cat.update_layout(template='plotly_white', yaxis_tickformat='.0%')
+    return fig_reasons, fig_cat
 
-fig_reasons = px.pie(return_reasons, values='Count', names='Reason', title="Return Reasons Distribution", hole=0.4)
-fig_reasons.update_layout(template='plotly_white')
+def layout():
+    version, summary = get_snapshot('return_summary')
+    fig_reasons, fig_cat = FIGURE_CACHE.get_or_compute(version, lambda: build_return_figures(summary))
+    # One inventory row per product, kept sorted by product_id
+    products = get_inventory_snapshot()['product_id'].tolist()
+    # The risk predictor needs the model: start it now if nothing else has
+    ensure_model_training()
+    
+    return dbc.Container([
+        html.H2("Returns Intelligence", className="my-4"),
+        
+        dbc.Row([
+            dbc.Col(dcc.Graph(figure=fig_reasons), md=6),
+            dbc.Col(dcc.Graph(figure=fig_cat), md=6),
+        ]),
+        
+        html.Hr(),
+        html.H4("Return Risk Predictor"),
+        dbc.Card([
+            dbc.CardBody([
+                html.Label("Select Product"),
+                dcc.Dropdown(id='risk-product', options=products, placeholder="Product ID"),
+                html.Br(),
+                html.Div(id='risk-result')
+            ])
+        ])
+        
+    ], fluid=True)
 
-# Returns by Category
-cat_returns = df.groupby('category')['is_returned'].mean().reset_index()
-fig_cat = px.bar(cat_returns, x='category', y='is_returned', title="Return Prob by Category", color='is_returned', color_continuous_scale='RdYlGn_r')
-fig_cat.update_layout(template='plotly_white', yaxis_tickformat='.0%')
+def risk_color(risk):
+    if risk >= 0.3: return "danger"
+    if risk >= 0.15: return "warning"
+    return "success"
 
-layout = dbc.Container([
-    html.H2("Returns Intelligence", className="my-4"),
-    
-    dbc.Row([
-        dbc.Col(dcc.Graph(figure=fig_reasons), md=6),
-        dbc.Col(dcc.Graph(figure=fig_cat), md=6),
-    ]),
+@callback(
+    Output('risk-result', 'children'),
+    Input('risk-product', 'value')
+)
+@timed_callback
+def show_return_risk(product_id):
+    # Scored once per model/dataset version; each lookup is an index hit
+    table = get_return_risk_table()
+    if table is None:
+        registry = ensure_model_training()
+        if registry.status == 'failed':
+            return dbc.Alert(f"Model unavailable: {registry.error}", color="danger")
+        return dbc.Alert("The return model is warming up. Please try again in a few seconds.", color="warning")
+    if product_id is None or product_id not in table.index:
+        return html.P("Pick a product to see its predicted return risk.", className="text-muted")
     
-    html.Hr(),
-    html.H4("Return Risk Predictor (Demo)"),
-    dbc.Card([
-        dbc.CardBody([
-            html.P("Real-time risk scoring would go here using the classification model."),
-            dbc.Progress(value=25, color="success", label="25% Risk", striped=True)
-        ])
+    row = table.loc[product_id]
+    risk = float(row['return_risk'])
+    return html.Div([
+        html.P(f"{row['brand']} {row['category']} - ${row['original_price']:.2f} "
+               f"({int(row['contexts'])} size/color/season/price variants scored)"),
+        dbc.Progress(value=risk * 100, color=risk_color(risk), label=f"{risk:.0%} Risk", striped=True),
+        html.Small(f"Highest variant risk {row['max_risk']:.0%}, observed return rate {row['observed_return_rate']:.0%}",
+                   className="text-muted")
     ])
-    
-], fluid=True)
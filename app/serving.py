@@ -0,0 +1,180 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from app.model import CATEGORICAL_FEATURES, get_model_manager
+
+# 1. Request limits
+MAX_PRICE_POINTS = 1000
+DEFAULT_POINTS = 20
+MAX_REQUESTS = 64
+RESULT_COLUMNS = ['price', 'demand', 'revenue', 'return_prob', 'adjusted_revenue']
+
+class ModelNotReady(Exception):
+    """
+    Raised for requests that arrive before a model has been swapped in.
+    """
+
+def parse_optimize_request(payload):
+    """
+    Validates one JSON request and returns (context, prices, include_curve).
+    Prices come from an explicit "prices" list, or from min_price/max_price/n_points
+    (default: 40%-100% of original_price in 20 points). Raises ValueError on bad input.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Request must be a JSON object")
+    try:
+        original_price = float(payload['original_price'])
+    except KeyError:
+        raise ValueError("Missing field: original_price")
+    except (TypeError, ValueError):
+        raise ValueError("original_price must be a number")
+    if not np.isfinite(original_price) or original_price <= 0:
+        raise ValueError("original_price must be positive")
+
+    context = {}
+    for col in CATEGORICAL_FEATURES:
+        value = payload.get(col)
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"{col} must be a string")
+        context[col] = value
+    context['original_price'] = original_price
+
+    if 'prices' in payload:
+        try:
+            prices = np.asarray(payload['prices'], dtype=float)
+        except (TypeError, ValueError):
+            raise ValueError("prices must be a list of numbers")
+        if prices.ndim != 1:
+            raise ValueError("prices must be a list of numbers")
+    else:
+        try:
+            low = float(payload.get('min_price', original_price * 0.4))
+            high = float(payload.get('max_price', original_price))
+            n_points = int(payload.get('n_points', DEFAULT_POINTS))
+        except (TypeError, ValueError):
+            raise ValueError("min_price, max_price and n_points must be numbers")
+        if low > high:
+            raise ValueError("min_price must not exceed max_price")
+        # Checked before allocating: n_points comes straight from the client
+        if not 0 < n_points <= MAX_PRICE_POINTS:
+            raise ValueError(f"Between 1 and {MAX_PRICE_POINTS} price points are required")
+        prices = np.linspace(low, high, n_points)
+
+    if not 0 < len(prices) <= MAX_PRICE_POINTS:
+        raise ValueError(f"Between 1 and {MAX_PRICE_POINTS} price points are required")
+    if not np.isfinite(prices).all() or (prices < 0).any():
+        raise ValueError("Prices must be finite and non-negative")
+    include_curve = payload.get('include_curve', False)
+    if not isinstance(include_curve, bool):
+        raise ValueError("include_curve must be true or false")
+    return context, prices, include_curve
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-context optimization requests.
+    A worker thread collects requests for up to max_wait seconds (or max_batch requests)
+    and scores the whole batch with one predict call per model.
+    """
+    def __init__(self, get_manager=get_model_manager, max_batch=64, max_wait=0.005):
+        self.get_manager = get_manager
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    def submit(self, context, prices, include_curve=False):
+        """
+        Queues one request; returns a Future resolving to its result dict.
+        """
+        future = Future()
+        self._ensure_worker().put((context, prices, include_curve, future))
+        return future
+
+    def optimize(self, context, prices, include_curve=False, timeout=None):
+        """
+        Blocking submit(). Raises ModelNotReady, or concurrent.futures.TimeoutError.
+        """
+        return self.submit(context, prices, include_curve).result(timeout)
+
+    def _ensure_worker(self):
+        # Threads do not survive fork: a forked worker starts its own
+        with self._lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._queue,), name='optimize-batcher', daemon=True
+                )
+                self._thread.start()
+                self._pid = os.getpid()
+            return self._queue
+
+    def _run(self, requests):
+        while True:
+            batch = [requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        # One manager snapshot per batch, even if a new model is swapped in meanwhile
+        manager = self.get_manager()
+        if manager is None:
+            for *_, future in batch:
+                future.set_exception(ModelNotReady("Model is warming up"))
+            return
+        self._score(manager, batch)
+
+    def _score(self, manager, batch):
+        try:
+            sweeps = manager.predict_optimization_many(
+                [context for context, *_ in batch], [prices for _, prices, *_ in batch]
+            )
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][-1].set_exception(e)
+                return
+            # Re-score each request on its own so one bad request fails alone
+            for request in batch:
+                self._score(manager, [request])
+            return
+
+        for (_, _, include_curve, future), sweep in zip(batch, sweeps):
+            best = sweep.iloc[int(sweep['adjusted_revenue'].to_numpy().argmax())]
+            result = {col: float(best[col]) for col in RESULT_COLUMNS}
+            result['model_version'] = manager.model_version
+            if include_curve:
+                result['curve'] = {col: sweep[col].astype(float).tolist() for col in RESULT_COLUMNS}
+            future.set_result(result)
+
+_batcher = MicroBatcher()
+
+def get_batcher():
+    """
+    Returns the process-wide MicroBatcher.
+    """
+    return _batcher
+
+def optimize_requests(payloads, timeout=10.0, batcher=None):
+    """
+    Parses and submits every payload before waiting, so one HTTP request carrying
+    a list joins the same micro-batch as concurrent single requests.
+    """
+    if not 0 < len(payloads) <= MAX_REQUESTS:
+        raise ValueError(f"Between 1 and {MAX_REQUESTS} requests are allowed per call")
+    batcher = batcher or _batcher
+    parsed = [parse_optimize_request(p) for p in payloads]
+    futures = [batcher.submit(*request) for request in parsed]
+    deadline = time.monotonic() + timeout
+    return [f.result(max(deadline - time.monotonic(), 0)) for f in futures]
@@ -0,0 +1,158 @@
+import operator
+import re
+import numpy as np
+import pandas as pd
+from app.cache import LRUCache
+from app.data_manager import display_frame
+from app.metrics import register_cache
+
+# Sort indexes and filtered row orders per (table, dataset version, ...): paging
+# through a sorted/filtered table only slices a cached position array. Each entry
+# grows with the table, so the cache is bounded by bytes as well as by count
+TABLE_CACHE_BYTES = 64 * 2**20
+TABLE_CACHE = register_cache('table', LRUCache(maxsize=64, max_bytes=TABLE_CACHE_BYTES))
+
+# `{column} op value` clauses of a DataTable filter_query, joined by &&;
+# ops may carry DataTable's s (case-sensitive) / i (insensitive) prefix
+FILTER_CLAUSE = re.compile(
+    r'^\{(?P<column>[^}]+)\}\s*(?P<case>[si]?)(?P<op>>=|<=|!=|=|<|>|ge|le|lt|gt|ne|eq|contains|datestartswith)\s+(?P<value>.+)$'
+)
+COMPARISONS = {
+    '>=': operator.ge, 'ge': operator.ge,
+    '<=': operator.le, 'le': operator.le,
+    '<': operator.lt, 'lt': operator.lt,
+    '>': operator.gt, 'gt': operator.gt,
+    '!=': operator.ne, 'ne': operator.ne,
+    '=': operator.eq, 'eq': operator.eq,
+}
+
+def parse_filter_query(query):
+    """
+    Splits a filter_query into (column, op, case_insensitive, value) clauses.
+    Clauses that are not understood are skipped, as DataTable does for invalid input.
+    """
+    clauses = []
+    for part in (query or '').split(' && '):
+        match = FILTER_CLAUSE.match(part.strip())
+        if match is None:
+            continue
+        value = match['value'].strip()
+        if len(value) > 1 and value[0] == value[-1] and value[0] in '"\'`':
+            value = value[1:-1]
+        clauses.append((match['column'], match['op'], match['case'] == 'i', value))
+    return clauses
+
+def _text_mask(labels, op, insensitive, value):
+    labels = labels.astype(str)
+    if insensitive:
+        labels, value = labels.str.lower(), value.lower()
+    if op == 'contains':
+        return labels.str.contains(value, regex=False).to_numpy()
+    if op == 'datestartswith':
+        return labels.str.startswith(value).to_numpy()
+    return COMPARISONS[op](labels.to_numpy(), value)
+
+def _label_mask(series, op, insensitive, value):
+    """
+    Evaluates a clause on a categorical column once per category, then maps the
+    result onto the row codes (missing labels never match).
+    """
+    matches = _text_mask(series.cat.categories.to_series(), op, insensitive, value)
+    return np.append(matches, False)[series.cat.codes.to_numpy()]
+
+def _clause_mask(df, column, op, insensitive, value):
+    series = df[column]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return _label_mask(series, op, insensitive, value)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if op in ('contains', 'datestartswith'):
+            # '2024', '2024-05' or '2024-05-03': everything within that period
+            period = pd.Period(value)
+            return ((series >= period.start_time) & (series <= period.end_time)).to_numpy()
+        return COMPARISONS[op](series, pd.Timestamp(value)).to_numpy()
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+        return _text_mask(series, op, insensitive, value) & series.notna().to_numpy()
+    if pd.api.types.is_bool_dtype(series):
+        return COMPARISONS.get(op, operator.eq)(series.to_numpy(), value.lower() in ('true', '1'))
+    if op in ('contains', 'datestartswith'):
+        return display_frame(series.to_frame())[column].astype(str).str.contains(value, regex=False).to_numpy()
+    # Compare against the values the table shows (float32 noise rounded away)
+    shown = display_frame(series.to_frame())[column].to_numpy(dtype=float)
+    with np.errstate(invalid='ignore'):
+        return COMPARISONS[op](shown, float(value))
+
+def filter_mask(df, query):
+    """
+    Boolean row mask for a DataTable filter_query.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for column, op, insensitive, value in parse_filter_query(query):
+        if column not in df.columns:
+            continue
+        try:
+            mask &= _clause_mask(df, column, op, insensitive, value)
+        except (ValueError, TypeError):
+            # Unparseable value for this column's type: ignore the clause
+            continue
+    return mask
+
+def _sort_key(series):
+    """
+    Ascending sort key with missing values last; categoricals sort by label.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        rank = np.empty(len(series.cat.categories) + 1, dtype=np.int64)
+        rank[np.argsort(series.cat.categories.astype(str), kind='stable')] = np.arange(len(series.cat.categories))
+        rank[-1] = len(series.cat.categories)
+        return rank[series.cat.codes.to_numpy()]
+    return series.to_numpy()
+
+def sort_index(df, column, descending=False):
+    """
+    Stable row positions of df ordered by `column`, missing values last either way.
+    """
+    order = np.argsort(_sort_key(df[column]), kind='stable')
+    if descending:
+        n_missing = int(df[column].isna().sum())
+        present = order[:len(order) - n_missing]
+        order = np.concatenate([present[::-1], order[len(order) - n_missing:]])
+    return order.astype(np.int32 if len(order) < 2**31 else np.int64)
+
+def row_order(key, df, sort_by=None, filter_query=None):
+    """
+    Positions of the visible rows of a table in display order, cached per key
+    (which must identify df's contents, e.g. (table name, dataset version)).
+    """
+    sort = tuple((s['column_id'], s['direction']) for s in sort_by or [] if s['column_id'] in df.columns)[:1]
+    query = (filter_query or '').strip()
+
+    def compute():
+        if sort:
+            column, direction = sort[0]
+            positions = TABLE_CACHE.get_or_compute(
+                key + ('sort', column, direction),
+                lambda: sort_index(df, column, descending=direction == 'desc')
+            )
+        else:
+            positions = np.arange(len(df))
+        if query:
+            positions = positions[filter_mask(df, query)[positions]]
+        return positions
+
+    if not sort and not query:
+        # Natural order: nothing to materialize
+        return range(len(df))
+    return TABLE_CACHE.get_or_compute(key + ('rows', sort, query), compute)
+
+def query_page(key, df, page_current=0, page_size=10, sort_by=None, filter_query=None):
+    """
+    One page of a server-side DataTable: (records, page_count, matching row count).
+    """
+    # Callback inputs come from the client: never divide by a zero/negative page size
+    page_size = max(int(page_size or 10), 1)
+    positions = row_order(key, df, sort_by, filter_query)
+    page_count = max(-(-len(positions) // page_size), 1)
+    page_current = min(page_current or 0, page_count - 1)
+    start = page_current * page_size
+    page = df.take(positions[start:start + page_size])
+    return display_frame(page).to_dict('records'), page_count, len(positions)
@@ -0,0 +1,231 @@
+"""
+Benchmarks for the data, model and page hot paths.
+
+    python benchmarks/run.py                               # run, compare with baseline.json
+    python benchmarks/run.py --sizes 2500 100000 --output results.json
+    python benchmarks/run.py --update-baseline             # record a new baseline
+
+Each benchmark is timed over several runs (median/min wall time), then run once more
+under tracemalloc for its peak Python/NumPy allocation. Exits non-zero when a result
+is slower (or uses more memory) than the baseline by more than the tolerance.
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+DEFAULT_SIZES = [2_500, 25_000]
+GRID_SIZES = [20, 200, 2000]
+# Typical analytics page filter combinations: (brands, categories, seasons)
+ANALYTICS_FILTERS = {
+    'all': (None, None, None),
+    'one_brand': (['Zara'], None, None),
+    'brand_category_season': (['Zara', 'Gap'], ['Tops', 'Dresses'], ['Summer']),
+}
+CONTEXT = {
+    'brand': 'Zara',
+    'category': 'Tops',
+    'season': 'Summer',
+    'size': 'M',
+    'color': 'Black',
+    'original_price': 100.0
+}
+
+# Timings below this many ms are too noisy to fail on
+NOISE_FLOOR_MS = 5.0
+
+def measure(func, repeat=5, setup=None):
+    """
+    Times func() `repeat` times, then once more under tracemalloc for the peak memory.
+    setup() runs before every call, outside the timed region.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'median_ms': statistics.median(times),
+        'min_ms': min(times),
+        'peak_mb': peak / 1e6,
+        'repeat': repeat
+    }
+
+def page_module(path):
+    """
+    The page module Dash loaded for `path` (importing app.pages.* again would
+    register a second copy of the page and its callbacks).
+    """
+    import dash
+    module = next(page['module'] for page in dash.page_registry.values() if page['path'] == path)
+    return importlib.import_module(module)
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=5):
+    """
+    Generates a dataset per size and benchmarks every hot path on it.
+    Returns {benchmark name: measurement}.
+    """
+    # Importing the app registers the pages (and their callbacks)
+    import app.app
+    from app.model import get_model_registry
+
+    # Let the app's own start-up training finish so it does not skew the timings
+    get_model_registry().wait()
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='retail-bench-') as workdir:
+        for n in sizes:
+            results.update(_benchmark_size(n, os.path.join(workdir, f'retail_{n}.csv'), repeat))
+    return results
+
+def _benchmark_size(n, path, repeat):
+    from app import data_manager
+    from app.data_generation import write_retail_data
+    from app.data_manager import build_inventory_snapshot, load_data, new_retail_store, read_cache
+    from app.model import RetailModelManager
+    update_analytics = page_module('/analytics').update_analytics
+
+    results = {}
+    write_retail_data(path, n)
+
+    # 1. Loading: raw CSV parse and derivation vs the columnar cache
+    results[f'load_data.csv[n={n}]'] = measure(lambda: load_data(path, use_cache=False), repeat)
+    results[f'load_data.cache[n={n}]'] = measure(lambda: load_data(path), repeat)
+    assert read_cache(path) is not None
+    df = load_data(path)
+
+    # 2. Training
+    model = RetailModelManager()
+    results[f'train[n={n}]'] = measure(lambda: model.train(df), max(repeat // 2, 1))
+
+    # 3. Per-click optimization sweeps
+    for k in GRID_SIZES:
+        prices = [CONTEXT['original_price'] * (0.4 + 0.6 * i / max(k - 1, 1)) for i in range(k)]
+        results[f'predict_optimization[n={n},grid={k}]'] = measure(
+            lambda: model.predict_optimization(CONTEXT, prices), repeat * 4
+        )
+
+    # 4. Analytics callback against a store serving this dataset; the first call
+    # after a new dataset version builds the revenue cube
+    def fresh_store():
+        data_manager._store = new_retail_store(loader=lambda: df)
+
+    original_store = data_manager._store
+    try:
+        results[f'update_analytics.cold[n={n}]'] = measure(
+            lambda: update_analytics(None, None, None), repeat, setup=fresh_store
+        )
+        fresh_store()
+        for name, filters in ANALYTICS_FILTERS.items():
+            results[f'update_analytics.{name}[n={n}]'] = measure(lambda: update_analytics(*filters), repeat)
+    finally:
+        data_manager._store = original_store
+
+    # 5. Inventory snapshot
+    results[f'inventory_snapshot[n={n}]'] = measure(lambda: build_inventory_snapshot(df), repeat)
+    return results
+
+def environment():
+    import numpy
+    import pandas
+    import sklearn
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__,
+        'sklearn': sklearn.__version__
+    }
+
+def compare(results, baseline, time_tolerance=1.5, memory_tolerance=1.25):
+    """
+    Returns a list of regression messages: benchmarks whose median time or peak memory
+    exceeds the baseline by more than the tolerance ratio. Benchmarks missing from
+    either side are ignored.
+    """
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if (current['median_ms'] > previous['median_ms'] * time_tolerance
+                and current['median_ms'] - previous['median_ms'] > NOISE_FLOOR_MS):
+            regressions.append(
+                f"{name}: {current['median_ms']:.1f} ms vs baseline {previous['median_ms']:.1f} ms"
+            )
+        if current['peak_mb'] > previous['peak_mb'] * memory_tolerance and current['peak_mb'] - previous['peak_mb'] > 1:
+            regressions.append(
+                f"{name}: peak {current['peak_mb']:.1f} MB vs baseline {previous['peak_mb']:.1f} MB"
+            )
+    return regressions
+
+def print_table(results, baseline):
+    print(f"{'benchmark':<52} {'median ms':>10} {'min ms':>10} {'peak MB':>9} {'vs base':>8}")
+    for name, r in sorted(results.items()):
+        previous = baseline.get(name)
+        ratio = f"{r['median_ms'] / previous['median_ms']:.2f}x" if previous else '-'
+        print(f"{name:<52} {r['median_ms']:>10.2f} {r['min_ms']:>10.2f} {r['peak_mb']:>9.2f} {ratio:>8}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the retail app hot paths")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="Write the results as JSON to this path")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help="Store the results as the new baseline")
+    parser.add_argument('--time-tolerance', type=float, default=1.5, help="Allowed slowdown ratio")
+    parser.add_argument('--memory-tolerance', type=float, default=1.25, help="Allowed peak memory ratio")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.repeat)
+    report = {'environment': environment(), 'results': results}
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    print_table(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    if regressions:
+        print("\nPERFORMANCE REGRESSIONS:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    # Allow `python benchmarks/run.py`: import the `app` package from the repo root
+    sys.path[0] = ROOT
+    sys.exit(main())
@@ -0,0 +1,20 @@
+import os
+
+# gunicorn -c gunicorn.conf.py app.app:server
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+# Not os.cpu_count(): in a container that is the host's count, not the CPU quota
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+
+# Preload mode (RETAIL_PRELOAD=0 turns it off): the master imports the app, loads the
+# dataset and the saved model once and forks the workers from it, so they share one
+# copy copy-on-write instead of each loading their own. The master never trains; the
+# image saves the model at build time (see Dockerfile)
+preload_app = os.environ.get('RETAIL_PRELOAD', '1').lower() not in ('0', 'false', 'off', 'no')
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before any worker is forked
+    if preload_app:
+        from app.app import preload
+        status = preload()
+        server.log.info("Preloaded dataset and model (model %s)", status)
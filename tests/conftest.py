@@ -0,0 +1,26 @@
+import pytest
+from app.data_manager import load_data
+from app.model import RetailModelManager
+
+# Product context scored by the model, serving and core tests
+CONTEXT = {
+    'brand': 'Zara',
+    'category': 'Tops',
+    'season': 'Summer',
+    'size': 'M',
+    'color': 'Black',
+    'original_price': 100.0
+}
+
+@pytest.fixture
+def context():
+    return dict(CONTEXT)
+
+@pytest.fixture(scope='session')
+def model():
+    """
+    Model trained on the bundled dataset, shared by the tests that only read it.
+    """
+    manager = RetailModelManager()
+    manager.train(load_data())
+    return manager
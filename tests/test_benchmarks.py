@@ -0,0 +1,24 @@
+from benchmarks.run import compare, measure
+
+def test_measure_reports_time_and_peak_memory():
+    result = measure(lambda: bytearray(5_000_000), repeat=2)
+    assert result['repeat'] == 2
+    assert result['min_ms'] <= result['median_ms']
+    assert result['peak_mb'] >= 5
+
+def test_compare_flags_slowdowns_and_memory_growth():
+    baseline = {
+        'train[n=2500]': {'median_ms': 300.0, 'peak_mb': 4.0},
+        'predict[n=2500]': {'median_ms': 1.0, 'peak_mb': 0.1},
+        'removed': {'median_ms': 1.0, 'peak_mb': 0.1},
+    }
+    results = {
+        'train[n=2500]': {'median_ms': 500.0, 'peak_mb': 9.0},
+        # 2x slower but within the noise floor
+        'predict[n=2500]': {'median_ms': 2.0, 'peak_mb': 0.1},
+        'new': {'median_ms': 100.0, 'peak_mb': 1.0},
+    }
+    regressions = compare(results, baseline)
+    assert len(regressions) == 2
+    assert all(r.startswith('train[n=2500]') for r in regressions)
+    assert compare(results, baseline, time_tolerance=2.0, memory_tolerance=3.0) == []
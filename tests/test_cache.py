@@ -0,0 +1,39 @@
+import time
+from app.cache import LRUCache
+
+def test_lru_eviction_and_counters():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1   # 'a' becomes most recent
+    cache.put('c', 3)            # evicts 'b'
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    stats = cache.stats()
+    assert stats['hits'] == 2 and stats['misses'] == 1 and stats['size'] == 2
+
+def test_ttl_and_get_or_compute():
+    cache = LRUCache(maxsize=4, ttl=0.05)
+    calls = []
+    compute = lambda: calls.append(1) or 'value'
+    assert cache.get_or_compute('k', compute) == 'value'
+    assert cache.get_or_compute('k', compute) == 'value'
+    assert len(calls) == 1
+    time.sleep(0.06)
+    cache.get_or_compute('k', compute)
+    assert len(calls) == 2
+    cache.clear()
+    assert len(cache) == 0
+
+def test_max_bytes_bounds_array_entries():
+    import numpy as np
+    cache = LRUCache(maxsize=10, max_bytes=1000)
+    cache.put('a', np.zeros(100, dtype=np.int32))   # 400 bytes
+    cache.put('b', np.zeros(100, dtype=np.int32))
+    cache.put('c', np.zeros(100, dtype=np.int32))   # evicts 'a' to stay within 1000
+    assert cache.get('a') is None and cache.get('c') is not None
+    assert cache.stats()['bytes'] == 800
+    cache.put('huge', np.zeros(1000, dtype=np.int32))   # over the whole budget: not kept
+    assert cache.get('huge') is None and cache.stats()['bytes'] == 800
+    cache.put('c', np.zeros(10, dtype=np.int32))         # replacing an entry frees its bytes
+    assert cache.stats()['bytes'] == 440
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+from app.data_generation import generate_retail_data, iter_retail_data, write_retail_data
+from app.data_manager import load_data, parse_csv, read_columnar
+
+def test_generator_schema_and_distributions():
+    df = generate_retail_data(20000)
+    assert len(df) == 20000
+    assert list(df.columns) == [
+        'product_id', 'purchase_date', 'category', 'brand', 'season', 'size', 'color', 'stock_quantity',
+        'original_price', 'markdown_percentage', 'current_price', 'customer_rating', 'is_returned', 'return_reason'
+    ]
+    assert df.loc[df['category'] == 'Accessories', 'size'].isna().all()
+    assert df.loc[~df['is_returned'], 'return_reason'].isna().all()
+    assert df['return_reason'][df['is_returned']].notna().all()
+    assert 0.35 < (df['markdown_percentage'] > 0).mean() < 0.45
+    assert 0.12 < df['customer_rating'].isna().mean() < 0.18
+    assert df['stock_quantity'].between(0, 50).all()
+    np.testing.assert_allclose(df['current_price'], (df['original_price'] * (1 - df['markdown_percentage'])).round(2))
+
+def test_generator_is_seeded():
+    pd.testing.assert_frame_equal(generate_retail_data(500), generate_retail_data(500))
+    assert not generate_retail_data(500, seed=1).equals(generate_retail_data(500))
+    chunks = list(iter_retail_data(1000, chunk_size=300))
+    assert [len(c) for c in chunks] == [300, 300, 300, 100]
+
+def test_chunked_writers(tmp_path):
+    csv = str(tmp_path / 'retail.csv')
+    write_retail_data(csv, 5000, chunk_size=1200)
+    cached = load_data(csv)
+    parsed = parse_csv(csv)
+    assert len(cached) == len(parsed) == 5000
+    np.testing.assert_allclose(cached['Margin'], parsed['Margin'])
+    assert (cached['brand'].astype(str) == parsed['brand'].astype(str)).all()
+
+    columns = str(tmp_path / 'columns')
+    write_retail_data(columns, 5000, fmt='columnar', chunk_size=1200)
+    pd.testing.assert_frame_equal(read_columnar(columns), cached)
+
+def test_zero_rows_keep_the_schema(tmp_path):
+    empty = generate_retail_data(0)
+    assert len(empty) == 0
+    assert empty.dtypes.equals(generate_retail_data(10).dtypes)
+
+    csv = str(tmp_path / 'empty.csv')
+    write_retail_data(csv, 0)
+    assert pd.read_csv(csv).columns.tolist() == empty.columns.tolist()
+    cached = load_data(csv)
+    assert len(cached) == 0 and 'Margin' in cached.columns
+
+    columns = write_retail_data(str(tmp_path / 'columns'), 0, fmt='columnar')
+    assert read_columnar(columns).columns.tolist() == cached.columns.tolist()
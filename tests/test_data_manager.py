@@ -0,0 +1,154 @@
+import gzip
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from app.data_manager import DATA_PATH, DatasetStore, compact_frame, derive_columns, get_dataset, get_dataset_version, get_revenue_cube, filter_rows, iter_csv, iter_gzip, kpi_values, load_data, memory_report, new_retail_store, to_display_records
+
+def test_store_loads_once_and_shares_data():
+    calls = []
+    def loader():
+        calls.append(1)
+        return pd.DataFrame({'Revenue': [1.0, 2.0, 3.0]})
+
+    store = DatasetStore(loader)
+    a = store.get()
+    b = store.get()
+    assert len(calls) == 1
+    assert store.version == 1
+
+    # Local modifications must not leak into the shared frame
+    a['Revenue'] = 0.0
+    a['Extra'] = 1
+    assert b['Revenue'].tolist() == [1.0, 2.0, 3.0]
+    assert 'Extra' not in store.get().columns
+
+    store.reload()
+    assert len(calls) == 2
+    assert store.version == 2
+
+def test_shared_dataset():
+    df = get_dataset()
+    assert not df.empty
+    assert 'Revenue' in df.columns
+    assert get_dataset_version() >= 1
+
+def test_columnar_cache_roundtrip_and_invalidation(tmp_path):
+    src = pd.read_csv(DATA_PATH, nrows=200)
+    csv = tmp_path / 'retail.csv'
+    src.to_csv(csv, index=False)
+
+    fresh = load_data(str(csv))
+    cached = load_data(str(csv))
+    pd.testing.assert_frame_equal(fresh, cached)
+    assert isinstance(cached['brand'].dtype, pd.CategoricalDtype)
+    assert len(cached) == 200
+
+    # Rewriting the CSV invalidates the cache
+    src.head(50).to_csv(csv, index=False)
+    assert len(load_data(str(csv))) == 50
+
+def test_revenue_cube_matches_transaction_aggregates():
+    df = get_dataset()
+    cube = get_revenue_cube()
+    assert cube['Count'].sum() == len(df)
+    assert cube['Revenue'].sum() == pytest.approx(df['Revenue'].sum())
+
+    sel = df[df['brand'].isin(['Zara', 'Gap']) & df['season'].isin(['Summer'])]
+    part = cube[cube['brand'].isin(['Zara', 'Gap']) & cube['season'].isin(['Summer'])]
+    expected = sel.groupby(sel['purchase_date'].dt.to_period('M').astype(str))['Revenue'].sum()
+    np.testing.assert_allclose(part.groupby('Month')['Revenue'].sum().to_numpy(), expected.to_numpy())
+
+def test_store_aggregates_rebuild_per_version():
+    store = DatasetStore(lambda: pd.DataFrame({'Revenue': [1.0, 2.0]}))
+    builds = []
+    store.register_aggregate('total', lambda df: builds.append(1) or df['Revenue'].sum())
+    assert store.aggregate('total') == 3.0
+    assert store.aggregate('total') == 3.0
+    assert len(builds) == 1
+    store.reload()
+    store.aggregate('total')
+    assert len(builds) == 2
+
+def test_compact_schema_and_memory_report():
+    df = get_dataset()
+    assert isinstance(df['product_id'].dtype, pd.CategoricalDtype)
+    assert df['current_price'].dtype == np.float32
+    assert df['stock_quantity'].dtype == np.int16
+    # Counts beyond int16 widen instead of wrapping around
+    big = compact_frame(pd.DataFrame({'stock_quantity': [40000, 70000]}))
+    assert big['stock_quantity'].dtype == np.int32 and big['stock_quantity'].tolist() == [40000, 70000]
+
+    report = memory_report(df)
+    assert set(report['Column']) == set(df.columns)
+    assert report['Bytes'].sum() / len(df) < 100
+
+    record = to_display_records(df.head(1))[0]
+    assert record['current_price'] == round(record['current_price'], 4)
+
+def test_append_updates_frame_and_aggregates_by_delta():
+    raw = pd.read_csv(DATA_PATH)
+    full = new_retail_store(lambda: derive_columns(raw))
+    store = new_retail_store(lambda: derive_columns(raw.iloc[:2000]))
+    # Built before the append, so they are updated by delta
+    store.aggregate('revenue_cube')
+    store.aggregate('inventory')
+    store.aggregate('kpi_totals')
+    store.aggregate('return_summary')
+
+    version = store.append(raw.iloc[2000:].to_dict('records'))
+    assert version == store.version == 2
+    assert len(store.get()) == len(full.get()) == 3000
+    np.testing.assert_allclose(store.get()['Margin'], full.get()['Margin'])
+
+    cube, expected = store.aggregate('revenue_cube'), full.aggregate('revenue_cube')
+    assert cube['Count'].sum() == 3000
+    assert cube['Revenue'].sum() == pytest.approx(expected['Revenue'].sum())
+    assert len(cube) == len(expected)
+
+    inventory, expected = store.aggregate('inventory'), full.aggregate('inventory')
+    assert inventory['product_id'].astype(str).tolist() == expected['product_id'].astype(str).tolist()
+    assert inventory['stock_quantity'].tolist() == expected['stock_quantity'].tolist()
+
+    totals, expected = store.aggregate('kpi_totals'), full.aggregate('kpi_totals')
+    assert totals['rows'] == 3000 and totals['returned'] == expected['returned']
+    assert kpi_values(totals) == pytest.approx(kpi_values(expected))
+    df = full.get()
+    assert kpi_values(totals) == pytest.approx(
+        (df['Revenue'].sum(), df['Margin'].mean(), df['is_returned'].mean() * 100), rel=1e-5
+    )
+
+    summary, expected = store.aggregate('return_summary'), full.aggregate('return_summary')
+    assert summary['by_reason'].sort_index().to_dict() == expected['by_reason'].sort_index().to_dict()
+    assert summary['by_category'].sort_index().equals(expected['by_category'].sort_index())
+    assert summary['by_reason'].sum() == df['is_returned'].sum()
+
+def test_append_rejects_incomplete_rows():
+    store = new_retail_store()
+    with pytest.raises(ValueError):
+        store.append([{'product_id': 'FB000001'}])
+
+def test_streaming_csv_export_matches_full_frame():
+    df = load_data()
+    chunks = list(iter_csv(df, chunk_size=1000))
+    assert len(chunks) == 1 + -(-len(df) // 1000)
+    exported = pd.read_csv(io.StringIO(''.join(chunks)))
+    assert list(exported.columns) == list(df.columns)
+    assert len(exported) == len(df)
+    np.testing.assert_allclose(exported['current_price'], df['current_price'].astype(float), rtol=1e-6)
+
+    rows = filter_rows(df, brands=['Zara'], seasons=['Summer', 'Fall'])
+    expected = df[df['brand'].eq('Zara') & df['season'].isin(['Summer', 'Fall'])]
+    compressed = b''.join(iter_gzip(iter_csv(df, rows, chunk_size=100)))
+    filtered = pd.read_csv(io.BytesIO(gzip.decompress(compressed)))
+    assert filtered['product_id'].tolist() == expected['product_id'].astype(str).tolist()
+
+def test_download_route_streams_filtered_gzip():
+    from app.app import server
+    client = server.test_client()
+    response = client.get('/download/retail_data.csv?brand=Zara&gzip=1')
+    assert response.status_code == 200
+    assert response.is_streamed and response.mimetype == 'application/gzip'
+    exported = pd.read_csv(io.BytesIO(gzip.decompress(response.data)))
+    assert set(exported['brand']) == {'Zara'}
+    assert len(exported) == (get_dataset()['brand'] == 'Zara').sum()
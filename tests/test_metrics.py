@@ -0,0 +1,75 @@
+import pytest
+from app import metrics
+from app.cache import LRUCache
+from app.metrics import CALLBACK_LATENCY, ERRORS, Histogram, OPERATION_LATENCY, render_metrics, timed, timed_callback
+
+def test_timed_decorator_and_context_manager_record_latency():
+    @timed('test_op')
+    def work(x):
+        return x * 2
+
+    before = OPERATION_LATENCY.count('test_op')
+    assert work(21) == 42
+    with timed('test_op'):
+        pass
+    assert OPERATION_LATENCY.count('test_op') == before + 2
+
+    @timed('test_failing')
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        fail()
+    assert ERRORS.value('test_failing') == 1
+
+def test_timed_callback_keeps_function_identity():
+    def update_widget(value):
+        return value
+
+    wrapped = timed_callback(update_widget)
+    assert wrapped.__name__ == 'update_widget'
+    assert wrapped(3) == 3
+    assert CALLBACK_LATENCY.count('update_widget') == 1
+
+def test_off_switch_skips_recording():
+    @timed('test_switched')
+    def work():
+        return 1
+
+    metrics.set_enabled(False)
+    try:
+        work()
+        with timed('test_switched'):
+            pass
+    finally:
+        metrics.set_enabled(True)
+    assert OPERATION_LATENCY.count('test_switched') == 0
+
+def test_prometheus_text_format():
+    histogram = Histogram('test_seconds', "Test.", labelnames=('op',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, 'a')
+    lines = list(histogram.samples())
+    assert lines[:3] == [
+        ('test_seconds_bucket', '{op="a",le="0.1"}', 1),
+        ('test_seconds_bucket', '{op="a",le="1.0"}', 2),
+        ('test_seconds_bucket', '{op="a",le="+Inf"}', 3),
+    ]
+    assert lines[-1] == ('test_seconds_count', '{op="a"}', 3)
+
+    cache = metrics.register_cache('test_cache', LRUCache())
+    cache.get('missing')
+    text = render_metrics()
+    assert '# TYPE retail_operation_seconds histogram' in text
+    assert 'retail_cache_misses{cache="test_cache"} 1' in text
+    assert 'retail_model_info{' in text
+
+def test_metrics_endpoint():
+    from app.app import server
+    from app.data_manager import load_data
+    # Record a load_data sample here rather than rely on other modules having run
+    load_data()
+    response = server.test_client().get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'retail_operation_seconds_count{operation="load_data"}' in response.get_data(as_text=True)
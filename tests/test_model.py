@@ -0,0 +1,239 @@
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from app.data_manager import load_data
+from app.model import (
+    CategoricalEncoder, FlatForest, ModelRegistry, OPTIMIZATION_CACHE, RetailModelManager, UNKNOWN_CODE,
+    _map_bounded, aggregate_daily_sales, catalogue_contexts, data_fingerprint
+)
+
+def test_predict_optimization_schema(model, context):
+    prices = np.linspace(40, 100, 20)
+    results = model.predict_optimization(context, prices)
+    assert list(results.columns) == ['price', 'demand', 'revenue', 'return_prob', 'adjusted_revenue']
+    assert len(results) == 20
+    assert (results['demand'] >= 0.01).all()
+    assert results['return_prob'].between(0, 1).all()
+
+def test_predict_optimization_large_grid_matches_pointwise(model, context):
+    prices = np.linspace(40, 100, 2000)
+    grid = model.predict_optimization(context, prices)
+    assert len(grid) == 2000
+    single = model.predict_optimization(context, prices[[0, 1000, 1999]])
+    np.testing.assert_allclose(grid['adjusted_revenue'].to_numpy()[[0, 1000, 1999]], single['adjusted_revenue'])
+
+def test_artifact_roundtrip_and_staleness(model, tmp_path, context):
+    path = str(tmp_path / 'models.joblib')
+    model.save(path)
+
+    loaded = RetailModelManager.load(path, fingerprint=model.fingerprint)
+    assert loaded is not None
+    assert loaded.features == model.features
+    prices = np.linspace(40, 100, 10)
+    np.testing.assert_allclose(
+        loaded.predict_optimization(context, prices)['adjusted_revenue'],
+        model.predict_optimization(context, prices)['adjusted_revenue']
+    )
+
+    # Compiled node arrays are mapped from the file, not copied
+    assert all(isinstance(flat.threshold, np.memmap) for flat in loaded._flat_models)
+
+    # Different training data invalidates the artifact
+    assert RetailModelManager.load(path, fingerprint='other') is None
+    assert RetailModelManager.load(str(tmp_path / 'missing.joblib')) is None
+
+def test_flat_forest_matches_sklearn(model, context):
+    df = load_data()
+    X = model.prepare_features(df.sample(300, random_state=0))
+    X[:5, 0] = -1 # unseen labels
+    demand_flat, return_flat = model.compile_flat()
+    np.testing.assert_allclose(demand_flat.predict(X), model.demand_model.predict(X), rtol=1e-12)
+    np.testing.assert_allclose(return_flat.predict(X), model.return_model.predict_proba(X), rtol=1e-12)
+    assert isinstance(demand_flat, FlatForest) and demand_flat.predict(X[:1]).shape == (1,)
+
+    sklearn_model = RetailModelManager(backend='sklearn')
+    sklearn_model.__dict__.update({k: v for k, v in model.__dict__.items() if k != 'backend'})
+    prices = np.linspace(40, 100, 20)
+    np.testing.assert_allclose(
+        model.predict_optimization(context, prices).to_numpy(),
+        sklearn_model.predict_optimization(context, prices).to_numpy()
+    )
+
+def test_encoder_is_frozen_and_handles_unknowns():
+    df = pd.DataFrame({
+        'brand': pd.Categorical(['Zara', 'Gap', 'Zara']),
+        'category': ['Tops', 'Shoes', 'Tops'],
+        'season': ['Summer', 'Winter', 'Fall'],
+        'size': ['M', None, 'S'],
+        'color': ['Black', 'Red', 'Black']
+    })
+    encoder = CategoricalEncoder().fit(df)
+    assert list(encoder.vocabulary['size']) == ['M', 'NA', 'S']
+
+    new = pd.DataFrame({
+        'brand': pd.Categorical(['Gap', 'Mango', None]),
+        'size': ['S', None, 'XXL']
+    })
+    assert encoder.transform_column('brand', new['brand']).tolist() == [0, UNKNOWN_CODE, UNKNOWN_CODE]
+    assert encoder.transform_column('size', new['size']).tolist() == [2, 1, UNKNOWN_CODE]
+    assert encoder.transform_value('size', None) == 1
+    assert encoder.transform_value('color', 'Purple') == UNKNOWN_CODE
+    # Transforms never refit
+    assert list(encoder.vocabulary['brand']) == ['Gap', 'Zara']
+
+def test_optimize_batch_matches_single_sweeps(model, tmp_path):
+    contexts = catalogue_contexts(load_data()).head(30)
+    grid = np.linspace(0.4, 1.0, 20)
+    results = model.optimize_batch(contexts, grid, chunk_size=7)
+    assert len(results) == 30
+    assert (results['product_id'] == contexts['product_id'].reset_index(drop=True)).all()
+
+    row = contexts.iloc[12].to_dict()
+    sweep = model.predict_optimization(row, row['original_price'] * grid)
+    best = sweep.loc[sweep['adjusted_revenue'].idxmax()]
+    assert results.loc[12, 'best_price'] == pytest.approx(best['price'])
+    assert results.loc[12, 'adjusted_revenue'] == pytest.approx(best['adjusted_revenue'])
+
+    path = str(tmp_path / 'prices.csv')
+    assert model.optimize_batch(contexts, grid, chunk_size=7, output_path=path) == path
+    streamed = pd.read_csv(path)
+    np.testing.assert_allclose(streamed['best_price'], results['best_price'])
+
+def test_optimize_batch_process_pool_matches_serial(model):
+    contexts = catalogue_contexts(load_data()).head(40)
+    serial = model.optimize_batch(contexts, chunk_size=10)
+    pooled = model.optimize_batch(contexts, chunk_size=10, n_workers=2)
+    pd.testing.assert_frame_equal(serial, pooled)
+
+def test_map_bounded_keeps_order_and_a_bounded_window():
+    from concurrent.futures import ThreadPoolExecutor
+    submitted = []
+    def items():
+        for i in range(20):
+            submitted.append(i)
+            yield i
+
+    with ThreadPoolExecutor(2) as pool:
+        results = _map_bounded(pool, lambda x, k: x * k, items(), 4, 10)
+        assert next(results) == 0
+        # Only the window (plus the item waiting for a slot) was drawn from the input
+        assert len(submitted) <= 5
+        assert list(results) == [i * 10 for i in range(1, 20)]
+
+def test_threshold_search_is_at_least_as_good_as_dense_grid(model, context):
+    dense = model.predict_optimization(context, np.linspace(40, 100, 5000))
+    exact = model.find_optimal_price(context, 40, 100, method='thresholds')
+    refined = model.find_optimal_price(context, 40, 100, method='refine')
+    coarse = model.find_optimal_price(context, 40, 100, method='grid')
+
+    assert exact['adjusted_revenue'] >= dense['adjusted_revenue'].max() - 1e-6
+    assert exact['evaluations'] < len(dense)
+    assert refined['adjusted_revenue'] >= coarse['adjusted_revenue']
+    assert 40 <= exact['price'] <= 100
+    with pytest.raises(ValueError):
+        model.find_optimal_price(context, 40, 100, method='newton')
+
+def test_cached_optimization_hits_and_invalidates_on_retrain(context):
+    manager = RetailModelManager()
+    df = load_data()
+    manager.train(df.head(500))
+    prices = np.linspace(40, 100, 20)
+    OPTIMIZATION_CACHE.clear()
+    hits = OPTIMIZATION_CACHE.hits
+
+    first = manager.cached_optimization(context, prices)
+    assert manager.cached_optimization(dict(context), prices) is first
+    assert OPTIMIZATION_CACHE.hits == hits + 1
+
+    # ' Zara ' is not a known brand: it must not share (or poison) the Zara entry
+    unknown = manager.cached_optimization(dict(context, brand=' Zara '), prices)
+    assert unknown is not first
+    assert manager.cached_optimization(dict(context, brand='Nope'), prices) is unknown
+    expected = manager.predict_optimization(dict(context, brand=' Zara '), prices)
+    np.testing.assert_allclose(unknown[0].to_numpy(), expected.to_numpy())
+    assert manager.cached_optimization(context, prices) is first
+
+    manager.train(df.head(600))
+    assert len(OPTIMIZATION_CACHE) == 0
+    assert manager.cached_optimization(context, prices) is not first
+
+def test_incremental_training_adds_trees_and_keeps_fingerprint(context):
+    df = load_data().sort_values('purchase_date', kind='stable')
+    manager = RetailModelManager()
+    manager.train(df.iloc[:2500])
+    assert manager.training_report['mode'] == 'full'
+
+    report = manager.train_incremental(df.iloc[2500:], n_new_trees=5)
+    assert report['mode'] == 'incremental'
+    assert report['rows'] == 500
+    assert report['n_estimators'] == {'demand': 55, 'return': 55}
+    assert report['seconds'] > 0
+    # Same data in two steps fingerprints like the full frame
+    assert manager.fingerprint == data_fingerprint(df)
+    pd.testing.assert_series_equal(
+        manager._daily_sales.groupby('purchase_date')['units_sold'].sum(),
+        aggregate_daily_sales(df).groupby('purchase_date')['units_sold'].sum()
+    )
+    assert len(manager.predict_optimization(context, np.linspace(40, 100, 5))) == 5
+
+    manager.train(df, window_days=90)
+    assert manager.training_report['mode'] == 'window'
+    assert manager.training_report['rows'] < len(df)
+    assert len(manager.demand_model.estimators_) == 50
+
+def test_registry_serves_last_good_model_and_swaps_atomically(model):
+    registry = ModelRegistry()
+    release = threading.Event()
+
+    def slow_build():
+        release.wait(5)
+        return model
+
+    registry.start(slow_build)
+    assert registry.get() is None
+    assert registry.status == 'warming'
+    release.set()
+    assert registry.wait(5) is model
+    assert registry.status == 'ready'
+
+    # A failed retrain keeps the previous model serving
+    def broken_build():
+        raise RuntimeError('boom')
+    registry.start(broken_build, background=False)
+    assert registry.get() is model
+    assert registry.status == 'ready'
+    assert isinstance(registry.error, RuntimeError)
+
+def test_registry_retries_a_failed_first_build_with_backoff(model, monkeypatch):
+    from app import model as model_module
+    registry = ModelRegistry()
+    def broken_build():
+        raise RuntimeError('boom')
+    registry.start(broken_build, background=False)
+    assert registry.status == 'failed' and registry.failures == 1
+    assert not registry.retry_due()
+
+    monkeypatch.setattr(model_module, 'RETRY_BASE_SECONDS', 0)
+    assert registry.retry_due()
+    registry.start(lambda: model, background=False)
+    assert registry.status == 'ready' and registry.failures == 0 and not registry.retry_due()
+
+def test_predict_return_risk_batches_match_single(model, context):
+    df = load_data().head(50)
+    risk = model.predict_return_risk(df)
+    assert risk.shape == (50,) and ((risk >= 0) & (risk <= 1)).all()
+    np.testing.assert_allclose(risk, model.return_model.predict_proba(model.prepare_features(df))[:, 1])
+    first = df.iloc[0].to_dict()
+    assert model.predict_return_risk(first) == pytest.approx(risk[0])
+    # Without prices the item is scored at full price
+    assert 0 <= model.predict_return_risk(context) <= 1
+
+def test_return_risk_table_indexes_products(model):
+    df = load_data()
+    table = model.return_risk_table(df)
+    assert table.index.is_unique and set(table.index) == set(df['product_id'].unique())
+    assert table['return_risk'].is_monotonic_decreasing
+    product = table.index[0]
+    rows = df[df['product_id'] == product]
+    assert table.loc[product, 'observed_return_rate'] == pytest.approx(rows['is_returned'].mean())
@@ -0,0 +1,88 @@
+import threading
+import numpy as np
+import pytest
+from app.serving import MAX_REQUESTS, MicroBatcher, ModelNotReady, optimize_requests, parse_optimize_request
+
+def test_parse_optimize_request_defaults_and_errors(context):
+    context, prices, include_curve = parse_optimize_request(context)
+    assert context['original_price'] == 100.0
+    np.testing.assert_allclose(prices, np.linspace(40, 100, 20))
+    assert not include_curve
+    for bad in [[], {'brand': 'Zara'}, {'original_price': 'x'}, {'original_price': 10, 'prices': []},
+                {'original_price': 10, 'min_price': 9, 'max_price': 1}, dict(context, brand=['Zara']),
+                dict(context, n_points=10**12), dict(context, n_points=0), dict(context, include_curve='false')]:
+        with pytest.raises(ValueError):
+            parse_optimize_request(bad)
+
+def test_predict_optimization_many_matches_single(model, context):
+    other = dict(context, brand='Gap', category='Shoes', original_price=120.0)
+    grids = [np.linspace(40, 100, 20), np.linspace(50, 120, 7)]
+    sweeps = model.predict_optimization_many([context, other], grids)
+    for context, grid, sweep in zip([context, other], grids, sweeps):
+        single = model.predict_optimization(context, grid)
+        np.testing.assert_allclose(sweep.to_numpy(), single.to_numpy())
+
+def test_micro_batcher_coalesces_concurrent_requests(model, context):
+    calls = []
+    class CountingManager:
+        model_version = model.model_version
+        def predict_optimization_many(self, rows, price_ranges):
+            calls.append(len(rows))
+            return model.predict_optimization_many(rows, price_ranges)
+
+    batcher = MicroBatcher(get_manager=CountingManager, max_wait=0.05)
+    results = [None] * 16
+    def request(i):
+        results[i] = optimize_requests([dict(context, original_price=50.0 + i)], batcher=batcher)[0]
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sum(calls) == 16 and len(calls) < 16
+    expected = model.predict_optimization(dict(context, original_price=65.0), np.linspace(26, 65, 20))
+    best = expected.loc[expected['adjusted_revenue'].idxmax()]
+    assert results[15]['price'] == pytest.approx(best['price'])
+    assert results[15]['model_version'] == model.model_version
+
+def test_micro_batcher_isolates_a_failing_request(model, context):
+    class FragileManager:
+        model_version = model.model_version
+        def predict_optimization_many(self, rows, price_ranges):
+            if any(row['brand'] == 'Boom' for row in rows):
+                raise ValueError("Cannot score Boom")
+            return model.predict_optimization_many(rows, price_ranges)
+
+    batcher = MicroBatcher(get_manager=FragileManager, max_wait=0.05)
+    prices = np.linspace(40, 100, 5)
+    good, bad = batcher.submit(context, prices), batcher.submit(dict(context, brand='Boom'), prices)
+    assert 40 <= good.result(5)['price'] <= 100
+    with pytest.raises(ValueError):
+        bad.result(5)
+
+def test_micro_batcher_reports_warming_model(context):
+    batcher = MicroBatcher(get_manager=lambda: None)
+    with pytest.raises(ModelNotReady):
+        batcher.optimize(context, np.linspace(40, 100, 5), timeout=5)
+
+def test_optimize_endpoint(model, monkeypatch, context):
+    from app.app import server
+    from app import serving
+    monkeypatch.setattr(serving, '_batcher', MicroBatcher(get_manager=lambda: model))
+    client = server.test_client()
+
+    response = client.post('/api/optimize', json=dict(context, include_curve=True))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert 40 <= body['price'] <= 100 and len(body['curve']['price']) == 20
+
+    response = client.post('/api/optimize', json=[context, dict(context, n_points=5)])
+    assert response.status_code == 200 and len(response.get_json()) == 2
+    assert client.post('/api/optimize', json={'brand': 'Zara'}).status_code == 400
+    assert client.post('/api/optimize', json=dict(context, brand=['Zara'])).status_code == 400
+    assert client.post('/api/optimize', json=[context] * (MAX_REQUESTS + 1)).status_code == 400
+    assert client.post('/api/optimize', json=5).status_code == 400
+
+    monkeypatch.setattr(serving, '_batcher', MicroBatcher(get_manager=lambda: None))
+    assert client.post('/api/optimize', json=context).status_code == 503
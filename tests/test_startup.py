@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_python(code):
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+def test_app_import_defers_data_models_and_heavy_imports():
+    out = run_python(
+        "import sys\n"
+        "import app.app\n"
+        "from app import data_manager\n"
+        "from app.model import get_model_registry\n"
+        "print(data_manager.get_store()._df is None, get_model_registry().status,\n"
+        "      'sklearn' in sys.modules, 'plotly.express' in sys.modules)\n"
+    )
+    assert out == "True empty False False"
+
+def test_pages_build_state_on_first_visit_and_warm_up():
+    out = run_python(
+        "import dash\n"
+        "import app.app\n"
+        "from app.model import get_model_registry\n"
+        "layouts = [p['layout']() for p in dash.page_registry.values()]\n"
+        "print(len(layouts), get_model_registry().status in ('warming', 'ready'))\n"
+        "app.app.warm_up(background=False)\n"
+        "print(get_model_registry().wait() is not None)\n"
+    )
+    assert out.splitlines() == ["6 True", "True"]
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/smaps_rollup'), reason="needs fork and /proc smaps")
+def test_preload_shares_dataset_and_model_with_forked_workers(tmp_path):
+    out = run_python(
+        "import gc, os\n"
+        "import app.app\n"
+        "from app.data_manager import get_dataset\n"
+        "from app.model import get_model_manager\n"
+        "def memory(field):\n"
+        "    with open('/proc/self/smaps_rollup') as f:\n"
+        "        return next(int(line.split()[1]) for line in f if line.startswith(field + ':'))\n"
+        "from app.model import RetailModelManager\n"
+        "# The artifact the image saves at build time\n"
+        "trained = RetailModelManager()\n"
+        "trained.train(get_dataset())\n"
+        f"path = trained.save({str(tmp_path / 'models.joblib')!r})\n"
+        "del trained\n"
+        "print(app.app.preload(path), gc.get_freeze_count() > 0, get_dataset()['Revenue'].to_numpy().flags.writeable)\n"
+        "rss = memory('Rss')\n"
+        "pid = os.fork()\n"
+        "if pid == 0:\n"
+        "    # A worker: serves from the inherited model and data, then collects garbage\n"
+        "    before = memory('Private_Dirty')\n"
+        "    manager = get_model_manager()\n"
+        "    context = {'brand': 'Zara', 'category': 'Tops', 'season': 'Summer', 'size': 'M', 'color': 'Black', 'original_price': 100.0}\n"
+        "    manager.predict_optimization(context, [60.0, 80.0, 100.0])\n"
+        "    [p['layout']() for p in __import__('dash').page_registry.values()]\n"
+        "    gc.collect()\n"
+        "    os._exit(0 if memory('Private_Dirty') - before < rss * 0.25 else 1)\n"
+        "print(os.waitpid(pid, 0)[1])\n"
+    )
+    assert out.splitlines() == ["ready True False", "0"]
+
+def test_preload_never_trains_in_the_master(tmp_path):
+    out = run_python(
+        "import threading\n"
+        "import app.app\n"
+        "from app.data_manager import get_store\n"
+        f"status = app.app.preload({str(tmp_path / 'missing.joblib')!r})\n"
+        "# Data is shared, but no training thread would block (or be lost at) the fork\n"
+        "print(status, get_store()._df is not None, threading.active_count())\n"
+    )
+    assert out.splitlines()[-1] == "empty True 1"
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+from app.data_manager import load_data
+from app.table_query import TABLE_CACHE, filter_mask, parse_filter_query, query_page, sort_index
+
+def test_parse_filter_query():
+    clauses = parse_filter_query('{brand} scontains Zara && {current_price} >= 50 && {Status} s= "Low Stock" && junk')
+    assert clauses == [
+        ('brand', 'contains', False, 'Zara'),
+        ('current_price', '>=', False, '50'),
+        ('Status', '=', False, 'Low Stock')
+    ]
+
+def test_filter_mask_matches_pandas():
+    df = load_data()
+    mask = filter_mask(df, '{brand} icontains zara && {customer_rating} >= 4 && {purchase_date} datestartswith 2024-05')
+    expected = (df['brand'].eq('Zara') & (df['customer_rating'] >= 4)
+                & (df['purchase_date'].dt.strftime('%Y-%m') == '2024-05'))
+    np.testing.assert_array_equal(mask, expected.to_numpy())
+    # Float32 columns compare by their displayed value
+    price = round(float(df['current_price'].iloc[0]), 2)
+    assert filter_mask(df, f'{{current_price}} = {price}')[0]
+
+def test_sort_index_orders_labels_and_keeps_missing_last():
+    df = pd.DataFrame({
+        'brand': pd.Categorical(['Zara', 'Gap', None, 'Mango'], categories=['Zara', 'Mango', 'Gap']),
+        'rating': np.array([3.0, np.nan, 5.0, 1.0], dtype=np.float32)
+    })
+    assert sort_index(df, 'brand').tolist() == [1, 3, 0, 2]
+    assert sort_index(df, 'brand', descending=True).tolist() == [0, 3, 1, 2]
+    assert sort_index(df, 'rating', descending=True).tolist() == [2, 0, 3, 1]
+
+def test_query_page_returns_only_visible_rows():
+    df = load_data()
+    TABLE_CACHE.clear()
+    sort_by = [{'column_id': 'current_price', 'direction': 'desc'}]
+    records, page_count, total = query_page(('test', 0), df, 2, 10, sort_by, '{category} s= Shoes')
+
+    expected = df[df['category'] == 'Shoes'].sort_values('current_price', ascending=False, kind='stable')
+    assert total == len(expected) and page_count == -(-len(expected) // 10)
+    assert len(records) == 10
+    np.testing.assert_allclose([r['current_price'] for r in records], expected['current_price'].iloc[20:30], rtol=1e-6)
+
+    # Later pages slice the cached order
+    query_page(('test', 0), df, 3, 10, sort_by, '{category} s= Shoes')
+    assert TABLE_CACHE.stats()['hits'] >= 1
+
+    # A crafted page_size of 0 falls back to a usable page instead of dividing by zero
+    records, page_count, total = query_page(('test', 0), df, 0, 0)
+    assert len(records) == 10 and total == len(df)